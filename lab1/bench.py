@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Modified: 16 October 2026
+#
+# Copyright 2012-2015 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Benchmark of the read modes of the database server.
+
+Readers and writers hammer a Database the way the server's read and
+write methods do, in the locked and in the rcu read mode, and the read
+and write throughputs are printed for each. The writers can be made to
+hold the writer lock for a while after each write, as the lab5 servers
+do while they replicate.
+
+The database file is copied first, the original is left untouched.
+
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+
+sys.path.append("../modules")
+from Server import database
+from Server.Lock import readWriteLock
+
+# -----------------------------------------------------------------------------
+# Initialize and read the command line arguments
+# -----------------------------------------------------------------------------
+
+description = """\
+Compare the read throughput of the locked and rcu read modes under
+concurrent writes.\
+"""
+parser = argparse.ArgumentParser(description=description)
+parser.add_argument(
+    "-f", "--file", metavar="FILE", dest="file", default="dbs/fortune.db",
+    help="Set the database file. Default: dbs/fortune.db."
+)
+parser.add_argument(
+    "-s", "--storage", metavar="ENGINE", dest="storage", default="list",
+    choices=sorted(database.engines.keys()),
+    help="Set the storage engine. Default: list."
+)
+parser.add_argument(
+    "-l", "--lock-policy", metavar="POLICY", dest="lock_policy",
+    default="reader", choices=readWriteLock.policies,
+    help="Set the policy of the readers-writers lock. Default: reader."
+)
+parser.add_argument(
+    "-r", "--readers", metavar="COUNT", dest="readers", type=int, default=8,
+    help="Set the number of reader threads. Default: 8."
+)
+parser.add_argument(
+    "-w", "--writers", metavar="COUNT", dest="writers", type=int, default=2,
+    help="Set the number of writer threads. Default: 2."
+)
+parser.add_argument(
+    "-H", "--hold", metavar="SECONDS", dest="hold", type=float, default=0.0,
+    help="Keep the writer lock this long after each write, to mimic "
+         "replication. Default: 0."
+)
+parser.add_argument(
+    "-t", "--time", metavar="SECONDS", dest="time", type=float, default=3.0,
+    help="Set the length of each run. Default: 3."
+)
+opts = parser.parse_args()
+
+# -----------------------------------------------------------------------------
+# Auxiliary functions
+# -----------------------------------------------------------------------------
+
+
+def run(mode, db_file):
+    db = database.Database(db_file, opts.storage, "none")
+    rwlock = readWriteLock.ReadWriteLock(opts.lock_policy)
+    stop = threading.Event()
+    reads = [0] * opts.readers
+    writes = [0] * opts.writers
+
+    def reader(i):
+        count = 0
+        while not stop.is_set():
+            if mode == "rcu":
+                db.read()
+            else:
+                rwlock.read_acquire()
+                try:
+                    db.read()
+                finally:
+                    rwlock.read_release()
+            count = count + 1
+        reads[i] = count
+
+    def writer(i):
+        count = 0
+        while not stop.is_set():
+            rwlock.write_acquire()
+            try:
+                ticket = db.submit("Benchmark fortune {} {}".format(i, count))
+                if opts.hold:
+                    time.sleep(opts.hold)
+            finally:
+                rwlock.write_release()
+            ticket.wait()
+            count = count + 1
+        writes[i] = count
+
+    threads = [threading.Thread(target=reader, args=(i,))
+               for i in range(opts.readers)]
+    threads += [threading.Thread(target=writer, args=(i,))
+                for i in range(opts.writers)]
+    for t in threads:
+        t.start()
+    time.sleep(opts.time)
+    stop.set()
+    for t in threads:
+        t.join()
+    db.close()
+
+    return sum(reads) / opts.time, sum(writes) / opts.time
+
+# -----------------------------------------------------------------------------
+# The main program
+# -----------------------------------------------------------------------------
+
+print("{} readers, {} writers, {} storage, {} lock policy, {:g} s hold, "
+      "{:g} s per run".format(opts.readers, opts.writers, opts.storage,
+                              opts.lock_policy, opts.hold, opts.time))
+print("{:<8} {:>12} {:>12}".format("mode", "reads/s", "writes/s"))
+
+directory = tempfile.mkdtemp()
+try:
+    for mode in ("locked", "rcu"):
+        db_file = os.path.join(directory, mode + ".db")
+        shutil.copyfile(opts.file, db_file)
+        reads, writes = run(mode, db_file)
+        print("{:<8} {:>12.0f} {:>12.0f}".format(mode, reads, writes))
+finally:
+    shutil.rmtree(directory)
@@ -16,6 +16,10 @@ import socket
 import json
 import argparse
 
+sys.path.append("../modules")
+from Common import codec as wire
+from Common import stats
+
 # -----------------------------------------------------------------------------
 # Initialize and read the command line arguments
 # -----------------------------------------------------------------------------
@@ -41,7 +45,7 @@ exceptions = ['BaseException', 'SystemExit', 'KeyboardInterrupt',
     'UnicodeEncodeError', 'UnicodeTranslateError', 'Warning', 'DeprecationWarning',
     'PendingDeprecationWarning', 'RuntimeWarning', 'SyntaxWarning',
     'SyntaxWarning', 'FutureWarning', 'ImportWarning', 'UnicodeWarning',
-    'BytesWarning']
+    'BytesWarning', 'ServerBusyError']
 
 description = """\
 Client for a fortune database. It reads a random fortune from the database.\
@@ -51,6 +55,10 @@ parser.add_argument(
     "-w", "--write", metavar="FORTUNE", dest="fortune",
     help="Write a new fortune to the database."
 )
+parser.add_argument(
+    "-s", "--stats", action="store_true", dest="stats", default=False,
+    help="Print the server's call statistics."
+)
 parser.add_argument(
     "-i", "--interactive", action="store_true", dest="interactive",
     default=False, help="Interactive session with the fortune database."
@@ -71,12 +79,71 @@ class ComunicationError(Exception):
     pass
 
 
+class ServerBusyError(Exception):
+    pass
+
+
 class DatabaseProxy(object):
 
-    """Class that simulates the behavior of the database class."""
+    """Class that simulates the behavior of the database class.
+
+    The first call negotiates the given codec with the server; later
+    calls send their request right behind the hello. Servers that do not
+    know about codecs are talked to in newline-delimited JSON.
 
-    def __init__(self, server_address):
+    """
+
+    def __init__(self, server_address, codec="binary"):
         self.address = server_address
+        self.codec = wire.by_name(codec)
+        self.negotiated = False
+        self.reader = None
+
+    # Private methods
+
+    def _connect(self):
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.connect(self.address)
+        return s
+
+    def _call(self, request):
+        """Send the request on a new connection and return the reply."""
+
+        s = self._connect()
+        try:
+            if self.codec is not None and not self.negotiated:
+                codec = wire.client_handshake(s, self.codec)
+                if codec is None:
+                    # Older server, it already hung up on our hello.
+                    s.close()
+                    s = self._connect()
+                else:
+                    s.sendall(wire.frame(codec, request))
+                self.codec = codec
+                self.negotiated = True
+            elif self.codec is not None:
+                s.sendall(wire.hello(self.codec) +
+                          wire.frame(self.codec, request))
+                wire.recv_exactly(s, wire.HELLO_SIZE)
+
+            if self.codec is None:
+                worker = s.makefile(mode="rw")
+                worker.write(json.dumps(request) + '\n')
+                worker.flush()
+                line = worker.readline()
+                if line == '':
+                    raise ComunicationError("The server hung up")
+                return json.loads(line)
+
+            if self.reader is None:
+                self.reader = wire.FrameReader(s, 4096)
+            self.reader.attach(s)
+            payload = self.reader.read_frame()
+            if payload is None:
+                raise ComunicationError("The server hung up")
+            return self.codec.decode(payload)
+        finally:
+            s.close()
 
     # Public methods
 
@@ -96,45 +163,37 @@ class DatabaseProxy(object):
             'args' : []
         }
 
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect(server_address)
-
-        worker = s.makefile(mode="rw")
-        
-        requeststr = json.dumps(request)
-        worker.write(requeststr + '\n')
-        worker.flush()
-
-        reply = json.loads(worker.readline())
+        reply = self._call(request)
 
         self.checkError(reply)
 
         return reply['result']
 
-        pass
-
     def write(self, fortune):
-        
+
         request = {
             'method' : 'write',
             'args' : [fortune]
         }
 
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect(server_address)
+        reply = self._call(request)
+
+        self.checkError(reply)
 
-        worker = s.makefile(mode="rw")
-        
-        requeststr = json.dumps(request)
-        worker.write(requeststr + '\n')
-        worker.flush()
+        return reply['result']
+
+    def stats(self):
+
+        request = {
+            'method' : 'stats',
+            'args' : []
+        }
 
-        reply = json.loads(worker.readline())
+        reply = self._call(request)
 
         self.checkError(reply)
 
         return reply['result']
-        pass
 
 # -----------------------------------------------------------------------------
 # The main program
@@ -145,7 +204,9 @@ db = DatabaseProxy(server_address)
 
 if not opts.interactive:
     # Run in the normal mode.
-    if opts.fortune is not None:
+    if opts.stats:
+        print(stats.report(db.stats()))
+    elif opts.fortune is not None:
         db.write(opts.fortune)
     else:
         print(db.read())
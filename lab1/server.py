@@ -19,8 +19,12 @@ import argparse
 
 import sys
 sys.path.append("../modules")
-from Server.database import Database
-from Server.Lock.readWriteLock import ReadWriteLock
+from Common import codec as wire
+from Common import logger
+from Common.stats import MethodStats
+from Common.workerPool import WorkerPool, ServerBusyError
+from Server import database
+from Server.Lock import readWriteLock
 
 # -----------------------------------------------------------------------------
 # Initialize and read the command line arguments
@@ -43,11 +47,56 @@ parser.add_argument(
     "-f", "--file", metavar="FILE", dest="file", default="dbs/fortune.db",
     help="Set the database file. Default: dbs/fortune.db."
 )
+parser.add_argument(
+    "-s", "--storage", metavar="ENGINE", dest="storage", default="list",
+    choices=sorted(database.engines.keys()),
+    help="Set the storage engine keeping the fortunes in memory. "
+         "Default: list."
+)
+parser.add_argument(
+    "-d", "--durability", metavar="LEVEL", dest="durability",
+    default="flush", choices=database.groupCommit.levels,
+    help="Set when writes are done: none, flush, fsync-per-batch or "
+         "fsync-interval. Default: flush."
+)
+parser.add_argument(
+    "-r", "--read-mode", metavar="MODE", dest="read_mode", default="locked",
+    choices=["locked", "rcu"],
+    help="Set how reads are synchronized with writes: locked (take the "
+         "readers-writers lock) or rcu (read the published fortunes "
+         "without any lock). Default: locked."
+)
+parser.add_argument(
+    "-l", "--lock-policy", metavar="POLICY", dest="lock_policy",
+    default="reader", choices=readWriteLock.policies,
+    help="Set who goes first on the readers-writers lock: reader, writer "
+         "or fair. Default: reader."
+)
+parser.add_argument(
+    "-n", "--workers", metavar="WORKERS", dest="workers", type=int,
+    default=16, help="Set the number of worker threads. Default: 16."
+)
+parser.add_argument(
+    "-q", "--queue", metavar="SIZE", dest="queue_size", type=int,
+    default=64, help="Set the number of connections that may wait for a "
+                     "worker. Default: 64."
+)
+parser.add_argument(
+    "-c", "--per-client", metavar="COUNT", dest="per_client", type=int,
+    default=8, help="Set the number of connections from one host that may "
+                    "be queued or served at once. Default: 8."
+)
 opts = parser.parse_args()
 
 db_file = opts.file
+storage = opts.storage
+durability = opts.durability
+read_mode = opts.read_mode
+lock_policy = opts.lock_policy
 server_address = ("", opts.port)
 
+log = logger.get("server")
+
 # -----------------------------------------------------------------------------
 # Auxiliary classes
 # -----------------------------------------------------------------------------
@@ -57,13 +106,20 @@ class Server(object):
 
     """Class that provides synchronous access to the database."""
 
-    def __init__(self, db_file):
-        self.db = Database(db_file)
-        self.rwlock = ReadWriteLock()
+    def __init__(self, db_file, storage="list", durability="flush",
+                 read_mode="locked", lock_policy="reader"):
+        self.db = database.Database(db_file, storage, durability)
+        self.rwlock = readWriteLock.ReadWriteLock(lock_policy)
+        self.read_mode = read_mode
 
     # Public methods
 
     def read(self):
+        if self.read_mode == "rcu":
+            # Readers only see the fortunes published by the writers,
+            # which never change, so they need not lock anything.
+            return self.db.read()
+
         try:
             self.rwlock.read_acquire()
             return self.db.read()
@@ -75,30 +131,34 @@ class Server(object):
     def write(self, fortune):
         try:
             self.rwlock.write_acquire()
-            self.db.write(fortune)
+            ticket = self.db.submit(fortune)
         finally:
             self.rwlock.write_release()
 
-        pass
+        # Wait for the write outside the lock, it goes to disk along
+        # with those of the other writers.
+        ticket.wait()
 
-class Request(threading.Thread):
+class Request(object):
 
     """ Class for handling incoming requests.
-        Each request is handled in a separate thread.
+        Each request is handled by one of the worker threads.
     """
 
     def __init__(self, db_server, conn, addr):
-        threading.Thread.__init__(self)
         self.db_server = db_server
         self.conn = conn
         self.addr = addr
-        self.daemon = True
 
     # Private methods
 
-    def process_request(self, request):
-        """ Process a JSON formated request, send it to the database, and
-            return the result.
+    def process_request(self, request, codec=None):
+        """ Process a serialized request, send it to the database, and
+            return the serialized result.
+
+            The request is a JSON line, or the payload of a frame if the
+            client negotiated a codec, in which case the result is a
+            frame encoded with the same codec.
 
             The request format is:
                 {
@@ -106,7 +166,7 @@ class Request(threading.Thread):
                     "args": called_method_arguments
                 }
 
-            The returned result is a JSON of the following format:
+            The returned result has the following format:
                 -- in case of no error:
                     {
                         "result": called_method_result
@@ -119,17 +179,21 @@ class Request(threading.Thread):
                         }
                     }
         """
-        
-
 
         result = None
+        counters = None
 
         try:
-            req = json.loads(request)
+            if codec is None:
+                req = json.loads(request)
+            else:
+                req = codec.decode(request)
 
             method = req['method']
             args   = req['args']
 
+            counters, start = call_stats.begin(str(method))
+
             if method == 'write':
                 result = {
                     "result": self.db_server.write(args[0])
@@ -138,6 +202,10 @@ class Request(threading.Thread):
                 result = {
                     "result": self.db_server.read()
                 }
+            elif method == 'stats':
+                result = {
+                    "result": call_stats.snapshot()
+                }
             else:
                 #Produce same error
                 result = {
@@ -155,28 +223,69 @@ class Request(threading.Thread):
                 }
             }
 
-        return json.dumps(result)
-        pass
+        if counters is not None:
+            call_stats.end(counters, start, 'error' in result)
+
+        if codec is None:
+            return (json.dumps(result) + '\n').encode()
+        return wire.frame(codec, result)
 
     def run(self):
         try:
-            # Threat the socket as a file stream.
-            worker = self.conn.makefile(mode="rw")
-            # Read the request in a serialized form (JSON).
-            request = worker.readline()
+            codec = wire.server_handshake(self.conn)
+            if codec is None:
+                # Threat the socket as a file stream.
+                worker = self.conn.makefile(mode="r")
+                # Read the request in a serialized form (JSON).
+                request = worker.readline()
+            else:
+                # Read the request frame into this worker's buffer.
+                reader = getattr(buffers, "reader", None)
+                if reader is None:
+                    reader = buffers.reader = wire.FrameReader(self.conn)
+                reader.attach(self.conn)
+                request = reader.read_frame()
+                if request is None:
+                    raise EOFError("Connection closed before the request")
             # Process the request.
-            result = self.process_request(request)
+            result = self.process_request(request, codec)
             # Send the result.
-            worker.write(result + '\n')
-            worker.flush()
+            self.conn.sendall(result)
         except Exception as e:
             # Catch all errors in order to prevent the object from crashing
             # due to bad connections coming from outside.
-            print("The connection to the caller has died:")
-            print("\t{}: {}".format(type(e), e))
+            log.warning("The connection to the caller has died: %s: %s",
+                        type(e), e)
         finally:
             self.conn.close()
 
+    def refuse(self, e):
+        """ Answer straight away with the given error. """
+        try:
+            result = {
+                "error": {
+                    "name": str(type(e).__name__),
+                    "args": e.args
+                }
+            }
+            # Clients send their hello first, do not wait long for it.
+            self.conn.settimeout(0.5)
+            codec = wire.server_handshake(self.conn)
+            if codec is None:
+                self.conn.sendall((json.dumps(result) + '\n').encode())
+            else:
+                self.conn.sendall(wire.frame(codec, result))
+        except (socket.error, EOFError, wire.CodecError):
+            pass
+        finally:
+            self.conn.close()
+
+# Receive buffers, one for each worker thread.
+buffers = threading.local()
+
+# Statistics of the calls served, returned by the 'stats' method.
+call_stats = MethodStats()
+
 # -----------------------------------------------------------------------------
 # The main program
 # -----------------------------------------------------------------------------
@@ -185,11 +294,18 @@ print("Listening to: {}:{}".format(socket.gethostname(), opts.port))
 with open("srv_address.tmp", "w") as f:
     f.write("{}:{}\n".format(socket.gethostname(), opts.port))
 
-sync_db = Server(db_file)
+sync_db = Server(db_file, storage, durability, read_mode, lock_policy)
+print("Loaded {} fortunes, {} bytes in memory ({} storage).".format(
+    *sync_db.db.memory_usage(), storage))
+
+workers = WorkerPool(opts.workers, opts.queue_size, opts.per_client)
+# The refusals wait for the hello of the client, which must not hold up
+# the accepts; a few threads of their own are enough.
+refusers = WorkerPool(4, opts.queue_size, None)
 
 server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 server.bind(server_address)
-server.listen(1)
+server.listen(socket.SOMAXCONN)
 
 print("Press Ctrl-C to stop the server...")
 
@@ -198,8 +314,15 @@ try:
         try:
             conn, addr = server.accept()
             req = Request(sync_db, conn, addr)
-            print("Serving a request from {0}".format(addr))
-            req.start()
+            log.debug("Serving a request from %s", addr)
+            try:
+                workers.submit(addr[0], req.run)
+            except ServerBusyError as e:
+                try:
+                    refusers.submit(None, req.refuse, e)
+                except ServerBusyError:
+                    # Too busy even to say so.
+                    conn.close()
         except socket.error:
             continue
 except KeyboardInterrupt:
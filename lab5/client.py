@@ -18,6 +18,8 @@ sys.path.append("../modules")
 from Common import orb
 from Common.nameServiceLocation import name_service_address
 from Common.objectType import object_type
+from Common import stats
+from Common import lockStats
 
 # -----------------------------------------------------------------------------
 # Initialize and read the command line arguments
@@ -32,6 +34,14 @@ parser.add_argument(
     "-w", "--write", metavar="FORTUNE", dest="fortune",
     help="Write a new fortune to the database."
 )
+parser.add_argument(
+    "-l", "--load", metavar="FILE", dest="load_file",
+    help="Write all the fortunes of a fortune file to the database."
+)
+parser.add_argument(
+    "-s", "--stats", action="store_true", dest="stats", default=False,
+    help="Print the server's call and lock statistics."
+)
 parser.add_argument(
     "-i", "--interactive", action="store_true", dest="interactive",
     default=False, help="Interactive session with the fortune database."
@@ -50,6 +60,10 @@ server_type = opts.type
 server_id = opts.peer_id
 assert server_type != "object", "Change the object type to something unique!"
 
+# Fortunes written per batch by --load, so that no single request or
+# reply grows with the size of the file.
+load_batch_size = 200
+
 # -----------------------------------------------------------------------------
 # The main program
 # -----------------------------------------------------------------------------
@@ -69,7 +83,30 @@ db = orb.Stub(server_address)
 
 if not opts.interactive:
     # Run in the normal mode.
-    if opts.fortune is not None:
+    if opts.stats:
+        print(stats.report(db.stats()))
+        locks = db.lock_stats()
+        if locks:
+            print("")
+            print(lockStats.report(locks))
+    elif opts.load_file is not None:
+        # Entries are separated by lines holding a single '%'.
+        with open(opts.load_file, 'r') as f:
+            fortunes = [e.strip('\n') for e in f.read().split('\n%\n')]
+        fortunes = [e for e in fortunes if e]
+        print("Writing {} fortunes to the fortune database.".format(
+            len(fortunes)))
+        failed = []
+        for i in range(0, len(fortunes), load_batch_size):
+            with db.batch() as batch:
+                for fortune in fortunes[i:i + load_batch_size]:
+                    batch.write(fortune)
+            failed.extend(r for r in batch.results
+                          if isinstance(r, Exception))
+        if failed:
+            print("{} writes failed, the first with: {}".format(
+                len(failed), failed[0]))
+    elif opts.fortune is not None:
         print("Writing '{}' to the fortune database.".format(opts.fortune))
         db.write(opts.fortune)
     else:
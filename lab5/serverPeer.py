@@ -13,7 +13,9 @@
 a database.
 
 This server is one in a group of servers that all replicate the same
-data, so they implement 'read any write all' protocol.
+data, so they implement 'read any write all' protocol, or a quorum
+protocol (see Server.Replication.quorumReplication), or let a primary
+order the writes (see Server.Replication.primaryReplication).
 
 """
 
@@ -21,9 +23,11 @@ import sys
 import random
 import socket
 import argparse
+import threading
 
 sys.path.append("../modules")
 from Common import orb
+from Common import lockStats
 from Common.nameServiceLocation import name_service_address
 from Common.objectType import object_type
 
@@ -31,6 +35,10 @@ from Server import database
 from Server.peerList import PeerList
 from Server.Lock.distributedLock import DistributedLock
 from Server.Lock.distributedReadWriteLock import DistributedReadWriteLock
+from Server.Lock import readWriteLock
+from Server.Replication.quorumReplication import QuorumReplication
+from Server.Replication.primaryReplication import PrimaryReplication
+from Server.Replication import stateTransfer
 
 # -----------------------------------------------------------------------------
 # Initialize and read the command line arguments
@@ -54,11 +62,84 @@ parser.add_argument(
     "-f", "--file", metavar="FILE", dest="file", default="dbs/fortune.db",
     help="Set the database file. Default: dbs/fortune.db."
 )
+parser.add_argument(
+    "-s", "--storage", metavar="ENGINE", dest="storage", default="list",
+    choices=sorted(database.engines.keys()),
+    help="Set the storage engine keeping the fortunes in memory. "
+         "Default: list."
+)
+parser.add_argument(
+    "-d", "--durability", metavar="LEVEL", dest="durability",
+    default="flush", choices=database.groupCommit.levels,
+    help="Set when writes are done: none, flush, fsync-per-batch or "
+         "fsync-interval. Default: flush."
+)
+parser.add_argument(
+    "-r", "--read-mode", metavar="MODE", dest="read_mode", default="locked",
+    choices=["locked", "rcu"],
+    help="Set how reads are synchronized with writes: locked (take the "
+         "readers-writers lock) or rcu (read the published fortunes "
+         "without any lock). Default: locked."
+)
+parser.add_argument(
+    "-l", "--lock-policy", metavar="POLICY", dest="lock_policy",
+    default="reader", choices=readWriteLock.policies,
+    help="Set who goes first on the readers-writers lock: reader, writer "
+         "or fair. Default: reader."
+)
+parser.add_argument(
+    "-m", "--replication", metavar="MODE", dest="replication",
+    default="token", choices=["token", "quorum", "primary"],
+    help="Set how writes reach the other replicas: token (take the "
+         "distributed lock and write to all), quorum (write to W "
+         "replicas, read from R) or primary (the peer with the smallest "
+         "id orders the writes and sends them to all). Default: token."
+)
+parser.add_argument(
+    "-W", "--write-quorum", metavar="COUNT", dest="write_quorum", type=int,
+    default=None,
+    help="Set the number of replicas a write waits for, in quorum mode. "
+         "Default: a majority."
+)
+parser.add_argument(
+    "-R", "--read-quorum", metavar="COUNT", dest="read_quorum", type=int,
+    default=None,
+    help="Set the number of replicas a read consults, in quorum mode. "
+         "Default: the fewest that meet every write quorum."
+)
+parser.add_argument(
+    "-b", "--batch-writes", action="store_true", dest="batch_writes",
+    default=False,
+    help="Replicate the writes waiting for the token together, with a "
+         "single token acquisition (token mode)."
+)
+parser.add_argument(
+    "-j", "--join", action="store_true", dest="join", default=False,
+    help="Copy the database of a running replica, replacing the one in "
+         "the file, before serving (token mode)."
+)
+parser.add_argument(
+    "-e", "--engine", metavar="ENGINE", dest="engine", default="thread",
+    choices=sorted(orb.engines.keys()),
+    help="Set the engine serving incoming calls. Default: thread."
+)
 opts = parser.parse_args()
+if opts.join and opts.replication != "token":
+    parser.error("--join only works with token replication")
 
 local_port = opts.port
 db_file = opts.file
 server_type = opts.type
+engine = opts.engine
+storage = opts.storage
+durability = opts.durability
+read_mode = opts.read_mode
+lock_policy = opts.lock_policy
+batch_writes = opts.batch_writes
+replication = opts.replication
+write_quorum = opts.write_quorum
+read_quorum = opts.read_quorum
+join = opts.join
 assert server_type != "object", "Change the object type to something unique!"
 
 
@@ -71,14 +152,45 @@ class Server(orb.Peer):
 
     """Distributed mutual exclusion client class."""
 
-    def __init__(self, local_address, ns_address, server_type, db_file):
+    # The replica holding the token waits for write_local while it holds
+    # it, so write_local must not queue behind client calls.
+    urgent_calls = orb.Peer.urgent_calls | frozenset([
+        "write_local", "write_local_many", "replicate", "versions",
+        "fetch_writes", "apply_update", "sequence_number",
+        "send_snapshot", "fetch_tail"])
+
+    def __init__(self, local_address, ns_address, server_type, db_file,
+                 engine="thread", storage="list", durability="flush",
+                 read_mode="locked", lock_policy="reader",
+                 batch_writes=False, replication="token",
+                 write_quorum=None, read_quorum=None, join=False,
+                 token_timeout=30.0):
         """Initialize the client."""
 
-        orb.Peer.__init__(self, local_address, ns_address, server_type)
+        orb.Peer.__init__(self, local_address, ns_address, server_type,
+                          engine)
         self.peer_list = PeerList(self)
         self.distributed_lock = DistributedLock(self, self.peer_list)
-        self.drwlock = DistributedReadWriteLock(self.distributed_lock)
-        self.db = database.Database(db_file)
+        self.drwlock = DistributedReadWriteLock(self.distributed_lock,
+                                                lock_policy)
+        # Set once the database can be used; a joining replica first
+        # copies it from another one.
+        self.ready = threading.Event()
+        self.db = None
+        if not join:
+            self.db = database.Database(db_file, storage, durability)
+            self.ready.set()
+        self.read_mode = read_mode
+        # A write waiting longer than this for the token fails instead
+        # of keeping the writers of this replica waiting forever.
+        self.token_timeout = token_timeout
+        self.batch_writes = batch_writes
+        # Writes waiting to be replicated, in batch mode: lists of the
+        # fortune, an Event set once it is written and the error, if
+        # any. The thread holding batch_lock replicates them all.
+        self.pending = []
+        self.pending_lock = threading.Lock()
+        self.batch_lock = lockStats.Lock("write_batch")
         self.dispatched_calls = {
             "display_peers":      self.peer_list.display_peers,
             "acquire":            self.distributed_lock.acquire,
@@ -87,9 +199,79 @@ class Server(orb.Peer):
             "obtain_token":       self.distributed_lock.obtain_token,
             "display_status":     self.distributed_lock.display_status
         }
+        self.quorum = None
+        if replication == "quorum":
+            self.quorum = QuorumReplication(self, self.peer_list, self.db,
+                                            self.drwlock, write_quorum,
+                                            read_quorum)
+            self.dispatched_calls.update({
+                "replicate":          self.quorum.replicate,
+                "versions":           self.quorum.versions,
+                "fetch_writes":       self.quorum.fetch_writes,
+                "display_status":     self.quorum.display_status
+            })
+        self.sequencer = None
+        if replication == "primary":
+            self.sequencer = PrimaryReplication(self, self.peer_list,
+                                                self.db, self.drwlock)
+            self.dispatched_calls.update({
+                "sequence":           self.sequencer.sequence,
+                "apply_update":       self.sequencer.apply_update,
+                "sequence_number":    self.sequencer.sequence_number,
+                "display_status":     self.sequencer.display_status
+            })
         orb.Peer.start(self)
         self.peer_list.initialize()
         self.distributed_lock.initialize()
+        if self.sequencer is not None:
+            self.sequencer.initialize()
+        if join:
+            self._join(db_file, storage, durability)
+
+    # Private methods
+
+    def _token_acquire(self):
+        if not self.drwlock.token_acquire(self.token_timeout):
+            raise Exception("Timed out waiting for the token")
+
+    def _join(self, db_file, storage, durability):
+        """Copy the database of the replica with the smallest id.
+
+        The snapshot is streamed without holding the token, so the
+        other replicas go on writing meanwhile. The writes they send us
+        in the meantime are dropped: holding the token, we then fetch
+        all the writes made since the snapshot from the donor.
+
+        """
+
+        pids = [pid for pid in self.peer_list.get_peers()
+                if pid != self.id]
+        if not pids:
+            print("No replica to join, using {}.".format(db_file))
+            self.db = database.Database(db_file, storage, durability)
+            self.ready.set()
+            return
+
+        donor = self.peer_list.peer(min(pids))
+        address, count = donor.send_snapshot()
+        size = stateTransfer.receive(address, db_file)
+        self.db = database.Database(db_file, storage, durability)
+        if len(self.db) != count:
+            raise Exception("Received {} fortunes instead of {}".format(
+                len(self.db), count))
+
+        self._token_acquire()
+        try:
+            tail = donor.fetch_tail(count)
+            tickets = [self.db.submit(fortune) for fortune in tail]
+            for ticket in tickets:
+                ticket.wait()
+            self.ready.set()
+        finally:
+            self.drwlock.token_release()
+
+        print("Copied {} fortunes ({} bytes) from peer {}, then {} more "
+              "written meanwhile.".format(count, size, min(pids), len(tail)))
 
     # Public methods
 
@@ -112,9 +294,14 @@ class Server(orb.Peer):
     def read(self):
         """Read a fortune from the database."""
 
-        #
-        # Your code here.
-        #
+        self.ready.wait()
+        if self.quorum is not None:
+            self.quorum.catch_up()
+
+        if self.read_mode == "rcu":
+            # Do not wait for the writers, replication included: reads
+            # only see the fortunes already published.
+            return self.db.read()
 
         self.drwlock.read_acquire()
         try:
@@ -132,25 +319,101 @@ class Server(orb.Peer):
         atempt to obtain the distributed lock when writting their
         copies.
 
+        The token alone keeps the writers of all the servers in order.
+        The local writer lock is only held to hand the fortune to the
+        database, so the local readers do not wait for the replication.
+
         """
 
-        self.drwlock.write_acquire()
-        try:
-            self.db.write(fortune)
+        self.ready.wait()
+        if self.quorum is not None:
+            return self.quorum.write(fortune)
+        if self.sequencer is not None:
+            return self.sequencer.write(fortune)
+        if self.batch_writes:
+            return self._write_batched(fortune)
 
-            pids = sorted(self.peer_list.get_peers().keys())
-            for pid in pids:
-                if pid == self.id:
-                    continue
-                try:
-                    self.peer_list.peer(pid).write_local(fortune)
-                except:
+        self._token_acquire()
+        try:
+            self.drwlock.write_acquire_local()
+            try:
+                ticket = self.db.submit(fortune)
+            finally:
+                self.drwlock.write_release_local()
+
+            responses = self.peer_list.broadcast("write_local", fortune)
+            for pid in sorted(responses.keys()):
+                if responses[pid].error is not None:
                     print("could not ask a server to write : " + str(pid))
 
         finally:
-            self.drwlock.write_release()
+            self.drwlock.token_release()
 
-        pass
+        ticket.wait()
+
+    def _write_batched(self, fortune):
+        """Write a fortune along with the other pending writes.
+
+        The first writer to get batch_lock takes all the pending writes,
+        obtains the token once and replicates them with a single
+        write_local_many call per peer. The writers arriving meanwhile
+        queue up for the next batch.
+
+        """
+
+        entry = [fortune, threading.Event(), None]
+        self.pending_lock.acquire()
+        try:
+            self.pending.append(entry)
+        finally:
+            self.pending_lock.release()
+
+        self.batch_lock.acquire()
+        try:
+            if not entry[1].is_set():
+                self.pending_lock.acquire()
+                try:
+                    batch = self.pending
+                    self.pending = []
+                finally:
+                    self.pending_lock.release()
+                self._replicate_batch(batch)
+        finally:
+            self.batch_lock.release()
+
+        entry[1].wait()
+        if entry[2] is not None:
+            raise entry[2]
+
+    def _replicate_batch(self, batch):
+        fortunes = [entry[0] for entry in batch]
+        error = None
+        try:
+            self._token_acquire()
+            try:
+                self.drwlock.write_acquire_local()
+                try:
+                    tickets = [self.db.submit(f) for f in fortunes]
+                finally:
+                    self.drwlock.write_release_local()
+
+                responses = self.peer_list.broadcast("write_local_many",
+                                                     fortunes)
+                for pid in sorted(responses.keys()):
+                    if responses[pid].error is not None:
+                        print("could not ask a server to write : " +
+                              str(pid))
+            finally:
+                self.drwlock.token_release()
+
+            for ticket in tickets:
+                ticket.wait()
+        except Exception as e:
+            error = e
+
+        for entry in batch:
+            entry[2] = error
+            entry[1].set()
 
     def write_local(self, fortune):
         """Write a fortune to the database.
@@ -160,12 +423,58 @@ class Server(orb.Peer):
 
         """
 
+        if not self.ready.is_set():
+            # Joining: the write is fetched with the rest, see _join.
+            return
+
         self.drwlock.write_acquire_local()
         try:
-            self.db.write(fortune)
+            ticket = self.db.submit(fortune)
         finally:
             self.drwlock.write_release_local()
 
+        ticket.wait()
+
+    def write_local_many(self, fortunes):
+        """Write several fortunes to the database, in order.
+
+        The batched counterpart of write_local.
+
+        """
+
+        if not self.ready.is_set():
+            return
+
+        self.drwlock.write_acquire_local()
+        try:
+            tickets = [self.db.submit(fortune) for fortune in fortunes]
+        finally:
+            self.drwlock.write_release_local()
+
+        for ticket in tickets:
+            ticket.wait()
+
+    def send_snapshot(self):
+        """Offer a snapshot of the database to a joining replica.
+
+        Return the address to fetch it from and its number of fortunes,
+        see stateTransfer.serve.
+
+        """
+
+        return stateTransfer.serve(self.db, self.address[0])
+
+    def fetch_tail(self, start):
+        """Return the fortunes written from index start on.
+
+        Called by a joining replica holding the token, so no write is
+        under way but our own may not be done yet.
+
+        """
+
+        self.db.flush()
+        return self.db.fortunes(start)
+
     def register_peer(self, pid, paddr):
         """Register a server peer in this server's peer list."""
 
@@ -184,7 +493,11 @@ class Server(orb.Peer):
 
 # Initialize the client object.
 local_address = (socket.gethostname(), local_port)
-p = Server(local_address, name_service_address, server_type, db_file)
+p = Server(local_address, name_service_address, server_type, db_file,
+           engine, storage, durability, read_mode, lock_policy,
+           batch_writes, replication, write_quorum, read_quorum, join)
+print("Loaded {} fortunes, {} bytes in memory ({} storage).".format(
+    *p.db.memory_usage(), storage))
 
 
 def menu():
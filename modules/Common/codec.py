@@ -0,0 +1,352 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Modified: 16 October 2026
+#
+# Copyright 2012-2015 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Wire codecs and framing for the messages exchanged over the network.
+
+Messages (requests and replies) are dictionaries. Originally they were
+sent as newline-delimited JSON. Connections can now instead carry
+length-prefixed frames: a 4-byte big-endian length followed by the
+message encoded with one of the codecs of the registry.
+
+The framing and the codec are negotiated when the connection starts:
+    --  the client sends a hello: MAGIC, the id of the codec it would
+        like to use and a newline,
+    --  the server answers with a hello carrying the id of the codec
+        it picked (the requested one if it knows it, JSON otherwise),
+    --  from then on both ends exchange frames.
+
+A server that does not know about frames reads the client's hello as a
+malformed JSON line and answers with an error, after which the client
+falls back to newline-delimited JSON. A client that does not know about
+frames sends a JSON line straight away, which the server recognizes by
+its first byte.
+
+"""
+
+import json
+import socket
+import struct
+
+MAGIC = b"\x00ORB"
+HELLO_SIZE = len(MAGIC) + 2
+MAX_FRAME = 2 ** 26
+
+_length = struct.Struct(">I")
+
+
+class CodecError(Exception):
+    pass
+
+
+class JsonCodec(object):
+
+    """JSON, as in the newline-delimited format, but framed."""
+
+    id = 1
+    name = "json"
+
+    def encode(self, msg):
+        return json.dumps(msg).encode()
+
+    def decode(self, data):
+        return json.loads(str(data, "utf-8"))
+
+
+class BinaryCodec(object):
+
+    """Compact tagged binary encoding.
+
+    Each value is a one-byte tag followed by its payload:
+        --  N, T, F :: None, True, False,
+        --  i       :: 8-byte signed integer,
+        --  I       :: larger integer, as a decimal string,
+        --  d       :: 8-byte float,
+        --  s, b    :: 4-byte length and UTF-8 text, or raw bytes,
+        --  l       :: 4-byte count and the items of a list or tuple,
+        --  m       :: 4-byte count and the key, value pairs of a dict.
+
+    Unlike JSON, dictionary keys keep their type.
+
+    """
+
+    id = 2
+    name = "binary"
+
+    _int = struct.Struct(">q")
+    _float = struct.Struct(">d")
+
+    # Private methods
+
+    def _encode(self, value, out):
+        if value is None:
+            out.append(b"N")
+        elif value is True:
+            out.append(b"T")
+        elif value is False:
+            out.append(b"F")
+        elif isinstance(value, int):
+            if -2 ** 63 <= value < 2 ** 63:
+                out.append(b"i" + self._int.pack(value))
+            else:
+                text = str(value).encode()
+                out.append(b"I" + _length.pack(len(text)) + text)
+        elif isinstance(value, float):
+            out.append(b"d" + self._float.pack(value))
+        elif isinstance(value, str):
+            text = value.encode()
+            out.append(b"s" + _length.pack(len(text)))
+            out.append(text)
+        elif isinstance(value, (bytes, bytearray)):
+            out.append(b"b" + _length.pack(len(value)))
+            out.append(bytes(value))
+        elif isinstance(value, (list, tuple)):
+            out.append(b"l" + _length.pack(len(value)))
+            for item in value:
+                self._encode(item, out)
+        elif isinstance(value, dict):
+            out.append(b"m" + _length.pack(len(value)))
+            for key, item in value.items():
+                self._encode(key, out)
+                self._encode(item, out)
+        else:
+            raise CodecError("Cannot encode values of type {}".format(
+                type(value).__name__))
+
+    def _decode(self, data, pos):
+        tag = data[pos]
+        pos = pos + 1
+        if tag == 0x4e:                                     # N
+            return None, pos
+        if tag == 0x54:                                     # T
+            return True, pos
+        if tag == 0x46:                                     # F
+            return False, pos
+        if tag == 0x69:                                     # i
+            return self._int.unpack_from(data, pos)[0], pos + 8
+        if tag == 0x64:                                     # d
+            return self._float.unpack_from(data, pos)[0], pos + 8
+        if tag in (0x73, 0x62, 0x49):                       # s, b, I
+            n = _length.unpack_from(data, pos)[0]
+            pos = pos + 4
+            if pos + n > len(data):
+                raise CodecError("Truncated message")
+            chunk = data[pos:pos + n]
+            if tag == 0x62:
+                return bytes(chunk), pos + n
+            text = str(chunk, "utf-8")
+            if tag == 0x49:
+                return int(text), pos + n
+            return text, pos + n
+        if tag == 0x6c:                                     # l
+            n = _length.unpack_from(data, pos)[0]
+            pos = pos + 4
+            items = []
+            for i in range(n):
+                item, pos = self._decode(data, pos)
+                items.append(item)
+            return items, pos
+        if tag == 0x6d:                                     # m
+            n = _length.unpack_from(data, pos)[0]
+            pos = pos + 4
+            items = {}
+            for i in range(n):
+                key, pos = self._decode(data, pos)
+                items[key], pos = self._decode(data, pos)
+            return items, pos
+        raise CodecError("Unknown tag {!r}".format(chr(tag)))
+
+    # Public methods
+
+    def encode(self, msg):
+        out = []
+        self._encode(msg, out)
+        return b"".join(out)
+
+    def decode(self, data):
+        try:
+            msg, pos = self._decode(memoryview(data), 0)
+        except (IndexError, ValueError, struct.error, RecursionError) as e:
+            # Truncated or garbled data.
+            raise CodecError("Malformed message: {}".format(e))
+        if pos != len(data):
+            raise CodecError("Trailing data after the message")
+        return msg
+
+
+# The codecs known to this side, by id.
+codecs = {}
+
+
+def register(codec):
+    """Make codec available for negotiation."""
+
+    codecs[codec.id] = codec
+
+
+def by_name(name):
+    for codec in codecs.values():
+        if codec.name == name:
+            return codec
+    raise CodecError("Unknown codec: '{}'".format(name))
+
+
+register(JsonCodec())
+register(BinaryCodec())
+
+
+# -----------------------------------------------------------------------------
+# Framing
+# -----------------------------------------------------------------------------
+
+
+def hello(codec):
+    return MAGIC + bytes([codec.id]) + b"\n"
+
+
+def frame(codec, msg):
+    """Encode msg as a length-prefixed frame."""
+
+    payload = codec.encode(msg)
+    return _length.pack(len(payload)) + payload
+
+
+def recv_exactly(sock, n):
+    data = b""
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise EOFError("Connection closed during the handshake")
+        data = data + chunk
+    return data
+
+
+def client_handshake(sock, codec):
+    """Offer codec to the server listening on sock.
+
+    Return the codec picked by the server, or None if the server only
+    understands newline-delimited JSON. In the latter case the server
+    has already answered our hello with an error, so the socket cannot
+    be used any further.
+
+    """
+
+    sock.sendall(hello(codec))
+    try:
+        data = recv_exactly(sock, HELLO_SIZE)
+    except (EOFError, socket.timeout):
+        return None
+    if data[:len(MAGIC)] != MAGIC or data[len(MAGIC)] not in codecs:
+        return None
+    return codecs[data[len(MAGIC)]]
+
+
+def server_handshake(sock):
+    """Answer the client's hello, if it sent one.
+
+    Return the codec to use on the connection, or None if the client
+    speaks newline-delimited JSON. Raise EOFError if the client hung up
+    without sending anything.
+
+    """
+
+    first = sock.recv(1, socket.MSG_PEEK)
+    if not first:
+        raise EOFError("Connection closed before the first request")
+    if first != MAGIC[:1]:
+        return None
+    codec = accept_hello(recv_exactly(sock, HELLO_SIZE))
+    sock.sendall(hello(codec))
+    return codec
+
+
+def accept_hello(data):
+    """Return the codec to answer the client's hello data with."""
+
+    if data[:len(MAGIC)] != MAGIC:
+        raise CodecError("Malformed hello")
+    return codecs.get(data[len(MAGIC)], codecs[JsonCodec.id])
+
+
+def frame_length(header):
+    """Return the payload length announced by a 4-byte frame header."""
+
+    n = _length.unpack_from(header)[0]
+    if n > MAX_FRAME:
+        raise CodecError("Frame of {} bytes is too large".format(n))
+    return n
+
+
+class FrameReader(object):
+
+    """Read length-prefixed frames from a socket.
+
+    The frames are received with recv_into into a single buffer that is
+    reused from one frame to the next (and only grown for frames larger
+    than it). The frame returned by read_frame is a view on that buffer,
+    it is only valid until the next call.
+
+    """
+
+    def __init__(self, sock, size=65536):
+        self.sock = sock
+        self.buf = bytearray(size)
+        self.view = memoryview(self.buf)
+        self.start = 0
+        self.end = 0
+
+    # Private methods
+
+    def _fill(self, n):
+        """Make sure n bytes are buffered from start on.
+
+        Return False if the connection closed before that.
+
+        """
+
+        if self.start + n > len(self.buf):
+            # Move what is left of the buffer to its beginning, growing
+            # it first if the frame does not fit at all.
+            pending = self.end - self.start
+            if n > len(self.buf):
+                buf = bytearray(max(n, 2 * len(self.buf)))
+                buf[:pending] = self.buf[self.start:self.end]
+                self.buf = buf
+                self.view = memoryview(self.buf)
+            else:
+                self.buf[:pending] = self.buf[self.start:self.end]
+            self.start = 0
+            self.end = pending
+
+        while self.end - self.start < n:
+            count = self.sock.recv_into(self.view[self.end:])
+            if count == 0:
+                return False
+            self.end = self.end + count
+        return True
+
+    # Public methods
+
+    def attach(self, sock):
+        """Start reading from another socket, keeping the buffer."""
+
+        self.sock = sock
+        self.start = 0
+        self.end = 0
+
+    def read_frame(self):
+        """Return the next frame's payload, or None on end of stream."""
+
+        if not self._fill(4):
+            return None
+        n = frame_length(self.view[self.start:self.start + 4])
+        self.start = self.start + 4
+        if not self._fill(n):
+            return None
+        payload = self.view[self.start:self.start + n]
+        self.start = self.start + n
+        return payload
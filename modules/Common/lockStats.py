@@ -0,0 +1,290 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Modified: 16 October 2026
+#
+# Copyright 2012-2015 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Contention statistics of named locks.
+
+Locks created through Lock(), RLock() and Condition() of this module
+record, under the name they are given, how often they were acquired, how
+long the threads waited for them and held them, and the largest number
+of threads that waited at once. Locks sharing a name share their
+statistics.
+
+The statistics are off by default: the factories then return the plain
+threading objects, which cost nothing more than before. Set the
+DISTR_LOCK_STATS environment variable (to anything but 0) to turn them
+on; they are then printed to stderr when the program exits, and peers
+return them from their lock_stats() method. Only the locks created after
+enable() is called are instrumented.
+
+Locks that are not plain locks (ReadWriteLock) record their statistics
+themselves, see get().
+
+"""
+
+import os
+import sys
+import time
+import atexit
+import threading
+
+enabled = os.environ.get("DISTR_LOCK_STATS", "") not in ("", "0")
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class LockStats(object):
+
+    """Statistics of the locks of one name.
+
+    A thread that wants the lock calls waiting(), then acquired() when
+    it got it (or gave up), and released() when it lets it go.
+
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.acquisitions = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+        self.queue = 0
+        self.max_queue = 0
+
+    def waiting(self):
+        """Return the time the wait starts at."""
+
+        self.lock.acquire()
+        try:
+            self.queue = self.queue + 1
+            if self.queue > self.max_queue:
+                self.max_queue = self.queue
+        finally:
+            self.lock.release()
+        return time.perf_counter()
+
+    def acquired(self, start, success=True):
+        """Record the end of the wait started at start.
+
+        Return the time the lock is held from.
+
+        """
+
+        now = time.perf_counter()
+        waited = now - start
+        self.lock.acquire()
+        try:
+            self.queue = self.queue - 1
+            self.wait_total = self.wait_total + waited
+            if waited > self.wait_max:
+                self.wait_max = waited
+            if success:
+                self.acquisitions = self.acquisitions + 1
+            else:
+                self.timeouts = self.timeouts + 1
+        finally:
+            self.lock.release()
+        return now
+
+    def released(self, since):
+        """Record the release of a lock held from since."""
+
+        held = time.perf_counter() - since
+        self.lock.acquire()
+        try:
+            self.hold_total = self.hold_total + held
+            if held > self.hold_max:
+                self.hold_max = held
+        finally:
+            self.lock.release()
+
+    def snapshot(self):
+        self.lock.acquire()
+        try:
+            return {
+                "acquisitions": self.acquisitions,
+                "timeouts": self.timeouts,
+                "wait_total": self.wait_total,
+                "wait_max": self.wait_max,
+                "hold_total": self.hold_total,
+                "hold_max": self.hold_max,
+                "queue": self.queue,
+                "max_queue": self.max_queue
+            }
+        finally:
+            self.lock.release()
+
+
+class InstrumentedLock(object):
+
+    """A threading.Lock recording its statistics."""
+
+    def __init__(self, lock, stats):
+        self.lock = lock
+        self.stats = stats
+        self.since = 0.0
+
+    def acquire(self, blocking=True, timeout=-1):
+        start = self.stats.waiting()
+        acquired = self.lock.acquire(blocking, timeout)
+        since = self.stats.acquired(start, acquired)
+        if acquired:
+            self.since = since
+        return acquired
+
+    def release(self):
+        since = self.since
+        self.lock.release()
+        self.stats.released(since)
+
+    def locked(self):
+        return self.lock.locked()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+class InstrumentedRLock(InstrumentedLock):
+
+    """A threading.RLock recording its statistics.
+
+    Only the outermost acquire and release of the owner count. The
+    private methods threading.Condition uses on its lock are passed on,
+    so waiting on a condition counts as releasing the lock.
+
+    """
+
+    def __init__(self, lock, stats):
+        InstrumentedLock.__init__(self, lock, stats)
+        self.depth = 0
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self.depth > 0 and self.lock._is_owned():
+            self.lock.acquire()
+            self.depth = self.depth + 1
+            return True
+        acquired = InstrumentedLock.acquire(self, blocking, timeout)
+        if acquired:
+            self.depth = 1
+        return acquired
+
+    def release(self):
+        self.depth = self.depth - 1
+        if self.depth > 0:
+            self.lock.release()
+        else:
+            InstrumentedLock.release(self)
+
+    def _is_owned(self):
+        return self.lock._is_owned()
+
+    def _release_save(self):
+        depth = self.depth
+        since = self.since
+        self.depth = 0
+        state = self.lock._release_save()
+        self.stats.released(since)
+        return state, depth
+
+    def _acquire_restore(self, saved):
+        state, depth = saved
+        start = self.stats.waiting()
+        self.lock._acquire_restore(state)
+        self.since = self.stats.acquired(start)
+        self.depth = depth
+
+
+def enable():
+    """Instrument the locks created from now on."""
+
+    global enabled
+    enabled = True
+
+
+def get(name):
+    """Return the LockStats of the locks named name, None if disabled."""
+
+    if not enabled:
+        return None
+    _registry_lock.acquire()
+    try:
+        stats = _registry.get(name)
+        if stats is None:
+            stats = _registry[name] = LockStats()
+        return stats
+    finally:
+        _registry_lock.release()
+
+
+def Lock(name):
+    if not enabled:
+        return threading.Lock()
+    return InstrumentedLock(threading.Lock(), get(name))
+
+
+def RLock(name):
+    if not enabled:
+        return threading.RLock()
+    return InstrumentedRLock(threading.RLock(), get(name))
+
+
+def Condition(name):
+    """Return a condition whose (reentrant) lock is named name."""
+
+    if not enabled:
+        return threading.Condition()
+    return threading.Condition(RLock(name))
+
+
+def snapshot():
+    """Return the statistics of all the named locks, by name.
+
+    Times are in seconds.
+
+    """
+
+    _registry_lock.acquire()
+    try:
+        registry = dict(_registry)
+    finally:
+        _registry_lock.release()
+    return {name: stats.snapshot() for name, stats in registry.items()}
+
+
+def report(snapshot):
+    """Format a snapshot as a table, one line per lock."""
+
+    lines = ["{:<28} {:>9} {:>8} {:>10} {:>10} {:>10} {:>10} {:>6}".format(
+        "lock", "acquired", "timeouts", "wait (ms)", "max (ms)",
+        "hold (ms)", "max (ms)", "queue")]
+    for name in sorted(snapshot.keys()):
+        s = snapshot[name]
+        waits = max(s["acquisitions"] + s["timeouts"], 1)
+        holds = max(s["acquisitions"], 1)
+        lines.append(
+            "{:<28} {:>9} {:>8} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f} "
+            "{:>6}".format(
+                name, s["acquisitions"], s["timeouts"],
+                1000 * s["wait_total"] / waits, 1000 * s["wait_max"],
+                1000 * s["hold_total"] / holds, 1000 * s["hold_max"],
+                s["max_queue"]))
+    return "\n".join(lines)
+
+
+def _dump():
+    if enabled and _registry:
+        sys.stderr.write(report(snapshot()) + "\n")
+
+
+atexit.register(_dump)
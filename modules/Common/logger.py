@@ -0,0 +1,118 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Modified: 16 October 2026
+#
+# Copyright 2012-2015 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Leveled logging for the network infrastructure.
+
+All the loggers live under the "distr" logger. Out of the box only
+warnings and errors are written (to stderr); tracing messages are logged
+at DEBUG level, which is off, so they cost a level check and nothing
+else. The arguments of a message are only formatted if it is written,
+so log with
+
+    log.debug("received %s", request)
+
+rather than formatting the message yourself.
+
+Logging can be turned on from the environment, without changing the
+scripts:
+    --  DISTR_LOG        :: level, e.g. "debug" or "info",
+    --  DISTR_LOG_FILE   :: write to this file instead of stderr,
+    --  DISTR_LOG_SAMPLE :: fraction (0 to 1) of the DEBUG messages to
+                            keep, the others are dropped.
+
+or by calling configure().
+
+"""
+
+import os
+import sys
+import atexit
+import queue
+import random
+import logging
+import logging.handlers
+
+root = logging.getLogger("distr")
+root.propagate = False
+
+_listener = None
+
+
+class SampleFilter(logging.Filter):
+
+    """Keep only a random fraction of the DEBUG messages."""
+
+    def __init__(self, rate):
+        logging.Filter.__init__(self)
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+def get(name):
+    """Return the logger for the given part of the system."""
+
+    return root.getChild(name)
+
+
+def configure(level=logging.WARNING, file=None, sample=1.0, buffered=True):
+    """Set where the messages go and which ones are kept.
+
+    With buffered set, the calling threads only queue the messages and a
+    background thread writes them out, so slow disks do not slow the
+    calls down. The queue is flushed when the program exits.
+
+    """
+
+    global _listener
+
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+    if file is None:
+        handler = logging.StreamHandler(sys.stderr)
+    else:
+        handler = logging.FileHandler(file)
+    handler.setFormatter(logging.Formatter(
+        "%(asctime)s %(threadName)s %(name)s %(levelname)s: %(message)s"))
+
+    if buffered:
+        _listener = logging.handlers.QueueListener(queue.SimpleQueue(),
+                                                   handler)
+        _listener.start()
+        handler = logging.handlers.QueueHandler(_listener.queue)
+
+    # Drop the messages before they are formatted or queued.
+    if sample < 1.0:
+        handler.addFilter(SampleFilter(sample))
+
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+def _stop():
+    if _listener is not None:
+        _listener.stop()
+
+
+atexit.register(_stop)
+
+configure(
+    level=os.environ.get("DISTR_LOG", "warning"),
+    file=os.environ.get("DISTR_LOG_FILE"),
+    sample=float(os.environ.get("DISTR_LOG_SAMPLE", "1.0")),
+    buffered="DISTR_LOG" in os.environ
+)
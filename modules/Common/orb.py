@@ -8,8 +8,20 @@
 # -----------------------------------------------------------------------------
 
 import threading
+import asyncio
 import socket
 import json
+import time
+import itertools
+import contextvars
+import concurrent.futures
+
+from . import codec as wire
+from . import logger
+from . import stats
+from . import lockStats
+from . import tracing
+from .workerPool import WorkerPool, ServerBusyError
 
 """Object Request Broker
 
@@ -19,9 +31,17 @@ objects that communicate via networks. This infrastructure consists of:
 --  Strub ::
         Represents the image of a remote object on the local machine.
         Used to connect to remote objects. Also called Proxy.
+--  FutureStub, AsyncStub ::
+        Stubs whose calls return futures, or awaitables for asyncio
+        code, instead of waiting for the reply.
+--  Batch ::
+        Several calls to a Stub sent together in one message.
 --  Skeleton ::
         Used to listen to incoming connections and forward them to the
         main object.
+--  AsyncSkeleton ::
+        Same as Skeleton, but serves all the connections from a single
+        asyncio event loop.
 --  Peer ::
         Class that implements basic bidirectional (Stub/Skeleton)
         communication. Any object wishing to transparently interact with
@@ -30,10 +50,344 @@ objects that communicate via networks. This infrastructure consists of:
 """
 
 
+log = logger.get("orb")
+
+
 class ComunicationError(Exception):
     pass
 
 
+class UnsentError(ComunicationError):
+
+    """The request did not reach the remote end, it is safe to retry."""
+
+    pass
+
+
+class Connection(object):
+
+    """A long-lived, multiplexed connection to a remote object.
+
+    The connection starts by negotiating the given codec with the remote
+    end (see the codec module). If codec is None, or if the remote end
+    does not know about codecs, messages are sent as newline-delimited
+    JSON instead.
+
+    Every request sent on the connection carries an "id" that the remote
+    end echoes in its reply, so many threads can have calls in flight on
+    the same connection and the replies can come back in any order. A
+    reader thread matches the replies to the waiting calls.
+
+    Remote ends that do not echo the id (older servers) answer their
+    requests in order and usually hang up after one reply. Until the
+    first reply shows that the remote end knows about ids, the
+    connection only lets one call in flight at a time. A reply without
+    an id closes the connection.
+
+    """
+
+    def __init__(self, address, timeout=None, codec=None):
+        self.address = address
+        self.sock = socket.create_connection(address, timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if codec is not None:
+            # Offer the codec; an older server answers with an error and
+            # we start over with newline-delimited JSON.
+            self.sock.settimeout(timeout or Connection.handshake_timeout)
+            codec = wire.client_handshake(self.sock, codec)
+            if codec is None:
+                self.sock.close()
+                self.sock = socket.create_connection(address, timeout)
+                self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY,
+                                     1)
+        self.sock.settimeout(None)
+        self.codec = codec
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.exclusive = threading.Lock()
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.multiplexed = False
+        self.closed = False
+        self.calls = 0
+        self.last_used = time.time()
+        self.reader = threading.Thread(target=self._read_replies)
+        self.reader.daemon = True
+        self.reader.start()
+
+    # Seconds to wait for the server's answer to our hello.
+    handshake_timeout = 5.0
+
+    # Private methods
+
+    def _replies(self):
+        """Yield the replies as they come in."""
+
+        if self.codec is None:
+            worker = self.sock.makefile(mode="r")
+            try:
+                for line in worker:
+                    yield json.loads(line)
+            finally:
+                worker.close()
+        else:
+            reader = wire.FrameReader(self.sock)
+            while True:
+                payload = reader.read_frame()
+                if payload is None:
+                    return
+                yield self.codec.decode(payload)
+
+    def _read_replies(self):
+        """Hand each incoming reply to the call that is waiting for it."""
+
+        try:
+            for rep in self._replies():
+                self.lock.acquire()
+                try:
+                    single = 'id' not in rep
+                    if not single:
+                        self.multiplexed = True
+                        rid = rep.pop('id')
+                    elif self.pending:
+                        # Older servers reply in the order of the requests.
+                        rid = next(iter(self.pending))
+                    else:
+                        rid = None
+                    entry = self.pending.pop(rid, None)
+                    self.calls = self.calls + 1
+                    self.last_used = time.time()
+                finally:
+                    self.lock.release()
+                if single:
+                    # Older servers hang up after one reply: do not let
+                    # the next call go out on the connection before we
+                    # see it.
+                    self.close()
+                if entry is not None:
+                    future, exclusive = entry
+                    if exclusive:
+                        self.exclusive.release()
+                    future.set_result(rep)
+                if single:
+                    return
+        except (socket.error, ValueError, wire.CodecError):
+            pass
+        finally:
+            self.close()
+
+    # Public methods
+
+    def is_healthy(self):
+        """The reader thread notices as soon as the remote end hangs up."""
+
+        return not self.closed
+
+    def inflight(self):
+        return len(self.pending)
+
+    def submit(self, request):
+        """Send a request and return a future for its reply."""
+
+        exclusive = not self.multiplexed
+        if exclusive:
+            self.exclusive.acquire()
+        future = concurrent.futures.Future()
+
+        self.lock.acquire()
+        try:
+            if self.closed:
+                if exclusive:
+                    self.exclusive.release()
+                raise UnsentError("Connection to {} is closed".format(
+                    self.address))
+            rid = next(self.ids)
+            self.pending[rid] = (future, exclusive)
+        finally:
+            self.lock.release()
+
+        frame = dict(request)
+        frame['id'] = rid
+        try:
+            data = encode_message(self.codec, frame)
+        except (TypeError, ValueError, wire.CodecError):
+            self.lock.acquire()
+            try:
+                del self.pending[rid]
+            finally:
+                self.lock.release()
+            if exclusive:
+                self.exclusive.release()
+            raise
+        try:
+            self.write_lock.acquire()
+            try:
+                self.sock.sendall(data)
+            finally:
+                self.write_lock.release()
+        except socket.error as e:
+            # The request was not written out whole, so the remote end
+            # cannot have run it.
+            self.lock.acquire()
+            try:
+                entry = self.pending.pop(rid, None)
+            finally:
+                self.lock.release()
+            if entry is not None and exclusive:
+                self.exclusive.release()
+            self.close()
+            raise UnsentError("Could not send to {}: {}".format(
+                self.address, e))
+        return future
+
+    def call(self, request):
+        """Send one request and wait for its reply."""
+
+        return self.submit(request).result()
+
+    def close(self):
+        """Close the connection and fail the calls still waiting on it."""
+
+        self.lock.acquire()
+        try:
+            if self.closed:
+                return
+            self.closed = True
+            pending = list(self.pending.values())
+            self.pending = {}
+        finally:
+            self.lock.release()
+
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self.sock.close()
+
+        for future, exclusive in pending:
+            if exclusive:
+                self.exclusive.release()
+            future.set_exception(ComunicationError(
+                "Connection closed by {}".format(self.address)))
+
+
+class ConnectionPool(object):
+
+    """Per-address pool of connections shared by all the stubs.
+
+    Connections whose remote end supports request ids are shared by all
+    the calling threads. The other connections are used by one call at a
+    time, and more of them are opened, up to max_size for each address,
+    when they are all busy. Connections are dropped as soon as their
+    remote end hangs up and closed once they have been idle for more
+    than idle_timeout seconds.
+
+    New connections offer the named codec. The addresses that turned
+    out not to support it are remembered and later connections to them
+    go straight to newline-delimited JSON.
+
+    """
+
+    def __init__(self, max_size=8, idle_timeout=30.0, connect_timeout=None,
+                 codec="binary"):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self.codec = wire.by_name(codec) if codec else None
+        self.lock = threading.Lock()
+        self.conns = {}
+        self.legacy = set()
+        self.last_sweep = time.time()
+
+    # Private methods
+
+    def _expired(self, conn, now):
+        return (not conn.pending and
+                now - conn.last_used > self.idle_timeout)
+
+    def _sweep(self, now):
+        """Close the connections that have been idle for too long."""
+
+        self.last_sweep = now
+        for address in list(self.conns.keys()):
+            keep = []
+            for conn in self.conns[address]:
+                if self._expired(conn, now):
+                    conn.close()
+                elif conn.is_healthy():
+                    keep.append(conn)
+            if keep:
+                self.conns[address] = keep
+            else:
+                del self.conns[address]
+
+    # Public methods
+
+    def ready(self, address):
+        """Return an open connection to address that calls can share
+        without waiting, or None. Never blocks on the network."""
+
+        self.lock.acquire()
+        try:
+            conns = [c for c in self.conns.get(address, [])
+                     if c.multiplexed and c.is_healthy()]
+            if conns:
+                return min(conns, key=Connection.inflight)
+            return None
+        finally:
+            self.lock.release()
+
+    def acquire(self, address):
+        """Return a connection to address, opening one if needed."""
+
+        now = time.time()
+        self.lock.acquire()
+        try:
+            if now - self.last_sweep > self.idle_timeout / 2:
+                self._sweep(now)
+            conns = [c for c in self.conns.get(address, [])
+                     if c.is_healthy()]
+            self.conns[address] = conns
+            free = [c for c in conns if c.multiplexed or not c.pending]
+            if free:
+                return min(free, key=Connection.inflight)
+            if len(conns) >= self.max_size:
+                # Wait in line on the least busy connection.
+                return min(conns, key=Connection.inflight)
+        finally:
+            self.lock.release()
+
+        log.debug("connecting to %s", address)
+        if address in self.legacy or self.codec is None:
+            conn = Connection(address, self.connect_timeout)
+        else:
+            conn = Connection(address, self.connect_timeout, self.codec)
+        self.lock.acquire()
+        try:
+            if conn.codec is None and self.codec is not None:
+                self.legacy.add(address)
+            self.conns.setdefault(address, []).append(conn)
+        finally:
+            self.lock.release()
+        return conn
+
+    def clear(self):
+        """Close all the connections."""
+
+        self.lock.acquire()
+        try:
+            for conns in self.conns.values():
+                for conn in conns:
+                    conn.close()
+            self.conns = {}
+        finally:
+            self.lock.release()
+
+
+# The pool shared by all the stubs of this process.
+pool = ConnectionPool()
+
+
 class Stub(object):
 
     """ Stub for generic objects distributed over the network.
@@ -54,12 +408,14 @@ class Stub(object):
     'UnicodeEncodeError', 'UnicodeTranslateError', 'Warning', 'DeprecationWarning',
     'PendingDeprecationWarning', 'RuntimeWarning', 'SyntaxWarning',
     'SyntaxWarning', 'FutureWarning', 'ImportWarning', 'UnicodeWarning',
-    'BytesWarning']
+    'BytesWarning', 'ServerBusyError']
 
     def __init__(self, address):
         self.address = tuple(address)
 
-    def checkError(self, reply):
+    def _exception(self, reply):
+        """Return the exception reported by reply, or None."""
+
         if 'result' not in reply and 'error' not in reply or 'error' in reply and reply['error']['name'] not in self.exceptions:
             reply = {
                 "error": {
@@ -68,9 +424,46 @@ class Stub(object):
                 }
             }
         if 'error' in reply:
-            e = eval(reply['error']['name'])(reply['error']['args'])
+            return eval(reply['error']['name'])(reply['error']['args'])
+        return None
+
+    def checkError(self, reply):
+        e = self._exception(reply)
+        if e is not None:
             raise e
 
+    def _send(self, request):
+        """Send request over a pooled connection and return the reply.
+
+        The call is recorded as a client span, whose context goes along
+        with the request.
+
+        """
+
+        span, token = tracing.start_span(
+            request.get('method', 'batch'), "client",
+            peer="{}:{}".format(*self.address))
+        request['trace'] = span.context()
+        failed = True
+        try:
+            conn = pool.acquire(self.address)
+            reused = conn.calls > 0
+            try:
+                reply = conn.call(request)
+            except UnsentError:
+                if not reused:
+                    raise
+                # The remote end may have dropped the connection just
+                # before we used it, retry once on a fresh one. Requests
+                # that may have been sent are not retried: the call may
+                # not be safe to run twice, like write.
+                conn = pool.acquire(self.address)
+                reply = conn.call(request)
+            failed = 'error' in reply
+            return conn, reply
+        finally:
+            tracing.finish(span, token, failed)
+
     def _rmi(self, method, *args):
 
         request = {
@@ -78,35 +471,67 @@ class Stub(object):
             "args": args
         }
 
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        #s.settimeout(5.0)
-        print ("connecting to : " + str(self.address))
-        s.connect(self.address)
+        conn, reply = self._send(request)
 
-        worker = s.makefile(mode="rw")
-        
-        requeststr = json.dumps(request)
-        worker.write(requeststr + '\n')
-        worker.flush()
+        log.debug("call to %s: %s -> %s", self.address, request, reply)
 
-        print ('request sent')
-        print (request)
+        self.checkError(reply)
 
-        try:
-            reply = json.loads(worker.readline())
+        return reply['result']
 
-            self.checkError(reply)
+    def call_many(self, calls):
+        """Make several calls in a single round trip.
 
-            s.close()
+        calls is a list of (method, args) pairs. The skeleton runs them
+        in order and the list of their results is returned, with the
+        exception instead of the result for the calls that failed.
 
-            print ("Received reply")
-            print (reply)
+        Remote objects that only speak newline-delimited JSON do not
+        know about batches, they are called once per call instead.
 
-            return reply['result']
-        except socket.timeout:
-            return None
+        """
 
-        pass
+        request = {
+            "batch": [{"method": m, "args": list(a)} for m, a in calls]
+        }
+
+        conn = pool.acquire(self.address)
+        if conn.codec is None:
+            results = []
+            for method, args in calls:
+                try:
+                    results.append(self._rmi(method, *args))
+                except Exception as e:
+                    results.append(e)
+            return results
+
+        conn, reply = self._send(request)
+
+        log.debug("batch to %s: %s -> %s", self.address, request, reply)
+
+        self.checkError(reply)
+
+        results = []
+        for rep in reply['result']:
+            e = self._exception(rep)
+            results.append(rep['result'] if e is None else e)
+        return results
+
+    def batch(self):
+        """Return a Batch collecting calls to this stub.
+
+        Use it as a context manager: the calls made on it are sent
+        together when the block exits, after which its results
+        attribute holds their outcomes (see call_many).
+
+            with stub.batch() as b:
+                b.write(first)
+                b.write(second)
+            print(b.results)
+
+        """
+
+        return Batch(self)
 
     def __getattr__(self, attr):
         """Forward call to name over the network at the given address."""
@@ -115,9 +540,242 @@ class Stub(object):
         return rmi_call
 
 
+# Threads on which FutureStub and AsyncStub calls open connections, and
+# wait for the connections that cannot be shared.
+_io_executor = concurrent.futures.ThreadPoolExecutor(16)
+
+
+class FutureStub(Stub):
+
+    """Stub whose calls return concurrent.futures.Future objects.
+
+    Calls return at once, so a thread can start calls to many remote
+    objects and then wait for all of them:
+
+        futures = [FutureStub(a).read() for a in addresses]
+        results = [f.result() for f in futures]
+
+    It shares the connection pool, and so the codecs, with Stub. When a
+    shared connection to the remote object is already open the request
+    is written straight away and the future is completed by the
+    connection's reader thread. Otherwise (first call, or older
+    servers) the call is made by a thread of a small shared pool.
+
+    """
+
+    def _blocking(self, function, *args):
+        # Carry the caller's trace context over to the pool's thread.
+        context = contextvars.copy_context()
+        return _io_executor.submit(context.run, function, self, *args)
+
+    def _rmi(self, method, *args):
+        conn = pool.ready(self.address)
+        if conn is None:
+            return self._blocking(Stub._rmi, method, *args)
+
+        request = {
+            "method": method,
+            "args": args
+        }
+        span, token = tracing.start_span(
+            method, "client", peer="{}:{}".format(*self.address),
+            activate=False)
+        request['trace'] = span.context()
+        try:
+            replies = conn.submit(request)
+        except ComunicationError:
+            tracing.finish(span, None, True)
+            return self._blocking(Stub._rmi, method, *args)
+
+        future = concurrent.futures.Future()
+
+        def done(f):
+            try:
+                reply = f.result()
+                log.debug("call to %s: %s -> %s", self.address, request,
+                          reply)
+                tracing.finish(span, None, 'error' in reply)
+                self.checkError(reply)
+                future.set_result(reply['result'])
+            except Exception as e:
+                if span.duration is None:
+                    tracing.finish(span, None, True)
+                future.set_exception(e)
+        replies.add_done_callback(done)
+
+        return future
+
+    def call_many(self, calls):
+        """Like Stub.call_many, but return a future of the results."""
+
+        return self._blocking(Stub.call_many, calls)
+
+
+class AsyncStub(FutureStub):
+
+    """Stub for asyncio code: calls return awaitables.
+
+        results = await asyncio.gather(
+            *[AsyncStub(a).read() for a in addresses])
+
+    The calls go through the same connections as FutureStub's, see
+    there.
+
+    """
+
+    def _rmi(self, method, *args):
+        return asyncio.wrap_future(FutureStub._rmi(self, method, *args))
+
+    def call_many(self, calls):
+        return asyncio.wrap_future(FutureStub.call_many(self, calls))
+
+
+class Batch(object):
+
+    """Calls collected for a single round trip, see Stub.batch."""
+
+    def __init__(self, stub):
+        self.stub = stub
+        self.calls = []
+        self.results = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.send()
+        return False
+
+    def send(self):
+        """Send the collected calls and return their results."""
+
+        calls, self.calls = self.calls, []
+        self.results = self.stub.call_many(calls)
+        return self.results
+
+    def __getattr__(self, attr):
+        """Record a call; return its position in the results."""
+        def batched_call(*args):
+            self.calls.append((attr, args))
+            return len(self.calls) - 1
+        return batched_call
+
+
+def encode_message(codec, msg):
+    """Put msg on the wire: framed by codec, or as a JSON line if None."""
+
+    if codec is None:
+        return (json.dumps(msg) + '\n').encode()
+    return wire.frame(codec, msg)
+
+
+def encode_reply(codec, rep):
+    """Like encode_message, but report results that cannot be encoded."""
+
+    try:
+        return encode_message(codec, rep)
+    except (TypeError, ValueError, wire.CodecError) as e:
+        err = error_reply(e)
+        if 'id' in rep:
+            err['id'] = rep['id']
+        return encode_message(codec, err)
+
+
+def error_reply(e):
+    """Build the reply that reports the exception e to the caller."""
+
+    return {
+        "error": {
+            "name": str(type(e).__name__),
+            "args": e.args
+        }
+    }
+
+
+def decode_request(codec, data):
+    """Decode a request received as data, see encode_message.
+
+    Raise ValueError or CodecError if it is not a request.
+
+    """
+
+    if codec is None:
+        req = json.loads(data)
+    else:
+        req = codec.decode(data)
+    if not isinstance(req, dict):
+        raise ValueError("Malformed request")
+    return req
+
+
+def process_request(obj, req, call_stats=None):
+    """Call the requested method on obj and build the reply.
+
+    A batch request carries a list of requests instead of a method. They
+    are processed in order and the reply's result is the list of their
+    replies.
+
+    Malformed requests are answered with an error, like failed calls.
+
+    If call_stats (a stats.MethodStats) is given, the call is recorded
+    in it. The call is also recorded as a server span, child of the
+    caller's span if the request carries a trace context; it is the
+    current span while the method runs.
+
+    """
+
+    span, token = tracing.start_span(
+        str(req.get('method', 'batch')), "server", req.get('trace'))
+    rep = None
+    try:
+        rep = _process(obj, req, call_stats)
+    except Exception as e:
+        rep = error_reply(e)
+    finally:
+        # Whatever happens, the thread must not keep the span current.
+        tracing.finish(span, token, rep is None or 'error' in rep)
+    return rep
+
+
+def _process(obj, req, call_stats):
+    if 'batch' in req:
+        batch = req['batch']
+        if (not isinstance(batch, list) or
+                not all(isinstance(r, dict) for r in batch)):
+            raise ValueError("Malformed batch")
+        return {
+            "result": [process_request(obj, r, call_stats)
+                       for r in batch]
+        }
+
+    if call_stats is not None:
+        counters, start = call_stats.begin(str(req.get('method')))
+    try:
+        rep = {
+            "result": getattr(obj, req['method'])(*req['args'])
+        }
+    except Exception as e:
+        rep = error_reply(e)
+    if call_stats is not None:
+        call_stats.end(counters, start, 'error' in rep)
+    return rep
+
+
 class Request(threading.Thread):
 
-    """Run the incoming requests on the owner object of the skeleton."""
+    """Run the incoming requests on the owner object of the skeleton.
+
+    A Request serves one connection for as long as the caller keeps it
+    open. Requests that carry an "id" are dispatched concurrently and
+    their replies are tagged with the same id, in whatever order they
+    complete. Requests without an id are served one after the other.
+
+    The caller may start the connection by negotiating a codec, in which
+    case requests and replies are length-prefixed frames; otherwise they
+    are newline-delimited JSON.
+
+    """
 
     def __init__(self, owner, conn, addr):
         threading.Thread.__init__(self)
@@ -125,41 +783,105 @@ class Request(threading.Thread):
         self.conn = conn
         self.owner = owner
         self.daemon = True
+        self.codec = None
+        self.write_lock = threading.Lock()
 
-    def run(self):
-        
-        print ('received request')
-
-        rep = {}
-        worker = self.conn.makefile(mode="rw")        
+    def _requests(self):
+        """Yield the requests as they come in.
 
-        try:
-            req = json.loads(worker.readline())
+        Requests that cannot be decoded are answered with an error right
+        away.
 
-            print (req)
-
-            rep = {
-                "result": getattr(self.owner.owner, req['method'])(*req['args'])
-            }
+        """
 
-        except Exception as e:
-            rep = {
-                "error": {
-                    "name": str(type(e).__name__),
-                    "args": e.args
-                }
-            }
+        if self.codec is None:
+            worker = self.conn.makefile(mode="r")
+            try:
+                for line in worker:
+                    try:
+                        yield decode_request(None, line)
+                    except ValueError as e:
+                        self._reply(error_reply(e))
+            finally:
+                worker.close()
+        else:
+            reader = wire.FrameReader(self.conn)
+            while True:
+                payload = reader.read_frame()
+                if payload is None:
+                    return
+                try:
+                    yield decode_request(self.codec, payload)
+                except (ValueError, wire.CodecError) as e:
+                    self._reply(error_reply(e))
+
+    def _reply(self, rep):
+        log.debug("reply to %s: %s", self.addr, rep)
+
+        data = encode_reply(self.codec, rep)
+        self.write_lock.acquire()
+        try:
+            self.conn.sendall(data)
+        except socket.error:
+            # The caller went away, nobody is waiting for this reply.
+            pass
+        finally:
+            self.write_lock.release()
+
+    def _serve(self, req, done=None):
+        rep = process_request(self.owner.owner, req, self.owner.call_stats)
+        if 'id' in req:
+            rep['id'] = req['id']
+        self._reply(rep)
+        if done is not None:
+            done.set()
+
+    def _dispatch(self, req, done=None):
+        """Hand the request to the skeleton's workers.
+
+        Urgent calls go to a pool of their own: they are short, and the
+        calls occupying the workers may well be waiting for them.
 
+        """
 
-        print ('sending reply')
-        print (rep)
+        if req.get('method') in self.owner.urgent_calls:
+            pool = self.owner.urgent_pool
+        else:
+            pool = self.owner.worker_pool
+        try:
+            # Limit the calls of a client, whatever its connections.
+            pool.submit(self.addr[0], self._serve, req, done)
+        except ServerBusyError as e:
+            rep = error_reply(e)
+            if 'id' in req:
+                rep['id'] = req['id']
+            self._reply(rep)
+            if done is not None:
+                done.set()
 
-        worker.write(json.dumps(rep) + '\n')
-        worker.flush()
+    def run(self):
 
-        self.conn.close()
-        
-        pass
+        try:
+            self.codec = wire.server_handshake(self.conn)
+
+            # Keep serving requests on this connection until the caller
+            # hangs up.
+            for req in self._requests():
+                log.debug("request from %s: %s", self.addr, req)
+
+                if 'id' in req:
+                    self._dispatch(req)
+                else:
+                    # Without ids the replies must go out in order.
+                    done = threading.Event()
+                    self._dispatch(req, done)
+                    done.wait()
+        except (socket.error, EOFError, wire.CodecError):
+            # The caller went away while we were talking to it, or does
+            # not speak our protocol.
+            pass
+        finally:
+            self.conn.close()
 
 
 class Skeleton(threading.Thread):
@@ -169,49 +891,198 @@ class Skeleton(threading.Thread):
     This is used to listen to an address of the network, manage incoming
     connections and forward calls to the generic owner class.
 
+    The calls are run by a WorkerPool of the given size. When its queue
+    is full, or when a caller already has per_client calls queued or
+    running, new calls are refused with a ServerBusyError. The owner's
+    urgent_calls bypass it and are run by a pool of urgent_workers of
+    their own, which refuses them only when its queue is full.
+
     """
 
-    def __init__(self, owner, address):
+    def __init__(self, owner, address, workers=16, queue_size=64,
+                 per_client=16, urgent_workers=16):
         threading.Thread.__init__(self)
         self.address = address
         self.owner = owner
         self.daemon = True
-        #
-        # Your code here.
-        #
-        print ("address")
-        print (self.address)
-        pass
+        self.urgent_calls = getattr(owner, "urgent_calls", frozenset())
+        self.worker_pool = WorkerPool(workers, queue_size, per_client)
+        self.urgent_pool = WorkerPool(urgent_workers, queue_size, None)
+        self.call_stats = stats.MethodStats()
+        log.debug("skeleton for %s", self.address)
 
     def run(self):
 
         server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.address = (socket.gethostname(), self.address[1])
         server.bind(self.address)
-        
-        server.listen(1)
+
+        server.listen(socket.SOMAXCONN)
 
         while True:
             try:
                 conn, addr = server.accept()
                 req = Request(self, conn, addr)
-                print("Serving a request from {0}".format(addr))
+                log.debug("serving a connection from %s", addr)
                 req.start()
             except socket.error:
                 continue
         pass
 
 
+class AsyncSkeleton(threading.Thread):
+
+    """Skeleton class running on an asyncio event loop.
+
+    It plays the same role as Skeleton, but all the connections are
+    served by a single event loop thread instead of one thread each.
+    The owner's methods may block, so they are run by WorkerPools with
+    the same admission control as Skeleton's; the event loop itself
+    never calls into the owner.
+
+    """
+
+    def __init__(self, owner, address, workers=32, queue_size=64,
+                 per_client=16, urgent_workers=16):
+        threading.Thread.__init__(self)
+        self.address = address
+        self.owner = owner
+        self.daemon = True
+        self.urgent_calls = getattr(owner, "urgent_calls", frozenset())
+        self.worker_pool = WorkerPool(workers, queue_size, per_client)
+        self.urgent_pool = WorkerPool(urgent_workers, queue_size, None)
+        self.call_stats = stats.MethodStats()
+        self.loop = None
+        log.debug("skeleton for %s", self.address)
+
+    # Private methods
+
+    def _reply(self, writer, codec, rep):
+        log.debug("reply: %s", rep)
+
+        writer.write(encode_reply(codec, rep))
+
+    async def _serve(self, req, writer, codec, client):
+        if req.get('method') in self.urgent_calls:
+            pool = self.urgent_pool
+        else:
+            pool = self.worker_pool
+        future = self.loop.create_future()
+
+        def call():
+            rep = process_request(self.owner, req, self.call_stats)
+            self.loop.call_soon_threadsafe(future.set_result, rep)
+
+        try:
+            pool.submit(client, call)
+            rep = await future
+        except ServerBusyError as e:
+            rep = error_reply(e)
+        if 'id' in req:
+            rep['id'] = req['id']
+        self._reply(writer, codec, rep)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            # The caller went away, nobody is waiting for this reply.
+            pass
+
+    async def _handle(self, reader, writer):
+        """Serve one connection until the caller hangs up."""
+
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Limit the calls of a client, whatever its connections.
+        client = writer.get_extra_info("peername")[0]
+        # Keep references to the running calls, the loop only keeps weak
+        # ones.
+        calls = set()
+        codec = None
+        try:
+            first = await reader.readexactly(1)
+            if first == wire.MAGIC[:1]:
+                data = first + await reader.readexactly(wire.HELLO_SIZE - 1)
+                codec = wire.accept_hello(data)
+                writer.write(wire.hello(codec))
+                first = b""
+
+            while True:
+                if codec is None:
+                    data = first + await reader.readline()
+                    first = b""
+                    if not data:
+                        break
+                else:
+                    header = await reader.readexactly(4)
+                    data = await reader.readexactly(wire.frame_length(header))
+                try:
+                    req = decode_request(codec, data)
+                except (ValueError, wire.CodecError) as e:
+                    self._reply(writer, codec, error_reply(e))
+                    continue
+
+                log.debug("request: %s", req)
+
+                if 'id' in req:
+                    call = asyncio.ensure_future(
+                        self._serve(req, writer, codec, client))
+                    calls.add(call)
+                    call.add_done_callback(calls.discard)
+                else:
+                    await self._serve(req, writer, codec, client)
+        except (ConnectionError, EOFError, ValueError, wire.CodecError):
+            # Broken connection, oversized request, or a caller that does
+            # not speak our protocol.
+            pass
+        finally:
+            writer.close()
+
+    async def _listen(self):
+        server = await asyncio.start_server(
+            self._handle, self.address[0], self.address[1],
+            backlog=socket.SOMAXCONN, limit=2 ** 24)
+        async with server:
+            await server.serve_forever()
+
+    # Public methods
+
+    def run(self):
+        self.address = (socket.gethostname(), self.address[1])
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._listen())
+
+
+# Skeleton implementations that can be chosen when creating a Peer.
+engines = {
+    "thread": Skeleton,
+    "asyncio": AsyncSkeleton
+}
+
+
 class Peer:
 
-    """Class, extended by objects that communicate over the network."""
+    """Class, extended by objects that communicate over the network.
+
+    The engine argument selects how incoming calls are served, see the
+    engines dictionary.
+
+    """
+
+    # Calls the peers make to each other as part of their own protocols.
+    # They are short and other calls are often waiting for them, so the
+    # skeleton never queues them behind the calls coming from clients.
+    urgent_calls = frozenset(["check", "stats", "spans", "lock_stats",
+                              "register_peer", "unregister_peer",
+                              "request_token", "obtain_token"])
 
-    def __init__(self, l_address, ns_address, ptype):
+    def __init__(self, l_address, ns_address, ptype, engine="thread"):
         self.type = ptype
         self.hash = ""
         self.id = -1
         self.address = self._get_external_interface(l_address)
-        self.skeleton = Skeleton(self, self.address)
+        self.skeleton = engines[engine](self, self.address)
         self.name_service_address = self._get_external_interface(ns_address)
         self.name_service = Stub(self.name_service_address)
 
@@ -247,6 +1118,7 @@ class Peer:
         self.skeleton.start()
         self.id, self.hash = self.name_service.register(self.type,
                                                         self.address)
+        tracing.configure(process="{}({})".format(self.type, self.id))
 
     def destroy(self):
         """Unregister the object before removal."""
@@ -257,3 +1129,30 @@ class Peer:
         """Checking to see if the object is still alive."""
 
         return (self.id, self.type)
+
+    def stats(self):
+        """Return the statistics of the calls served by this object.
+
+        See stats.MethodStats.snapshot for the format.
+
+        """
+
+        return self.skeleton.call_stats.snapshot()
+
+    def lock_stats(self):
+        """Return the contention statistics of the named locks.
+
+        Empty unless lock statistics are enabled, see lockStats.
+
+        """
+
+        return lockStats.snapshot()
+
+    def spans(self, count=None):
+        """Return the last count spans recorded by this process.
+
+        See tracing.Span.record for the format.
+
+        """
+
+        return tracing.recorder.recent(count)
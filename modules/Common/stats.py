@@ -0,0 +1,187 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Modified: 16 October 2026
+#
+# Copyright 2012-2015 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Per-method call statistics.
+
+For each method the servers record the number of calls, of failed calls,
+of calls in flight, the total time spent and a histogram of the call
+latencies over fixed buckets.
+
+The counters are striped: every thread updates its own set of counters,
+so recording a call takes no lock at all. The sets are only added up
+when somebody asks for a snapshot, which may then be off by the calls
+that are being recorded at that very moment. The counters of the
+threads that are over are folded into a single set, as the servers
+start a thread for some calls.
+
+"""
+
+import time
+import bisect
+import threading
+
+# Upper bounds, in seconds, of the latency buckets. The last bucket
+# holds everything slower than the last bound.
+BOUNDS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+          0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Layout of the counters kept for each method.
+_STARTED = 0
+_FINISHED = 1
+_ERRORS = 2
+_TIME = 3
+_BUCKETS = 4
+
+
+class MethodStats(object):
+
+    """Statistics of the calls to the methods of one object.
+
+    Public methods:
+        --  begin(method)
+        --  end(counters, start, failed)
+        --  snapshot()
+
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        # Pairs of a live thread and its counters.
+        self.shards = []
+        # The counters of the threads that are over, added up.
+        self.retired = {}
+
+    # Private methods
+
+    def _shard(self):
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = self.local.shard = {}
+            self.lock.acquire()
+            try:
+                self._retire()
+                self.shards.append((threading.current_thread(), shard))
+            finally:
+                self.lock.release()
+        return shard
+
+    def _retire(self):
+        """Fold the counters of the threads that are over into retired.
+
+        Call with lock held.
+
+        """
+
+        live = []
+        for thread, shard in self.shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                _add(self.retired, shard)
+        self.shards = live
+
+    # Public methods
+
+    def begin(self, method):
+        """Record the start of a call.
+
+        Return the counters and the start time to give to end(), which
+        must be called from the same thread.
+
+        """
+
+        shard = self._shard()
+        counters = shard.get(method)
+        if counters is None:
+            counters = shard[method] = [0, 0, 0, 0.0] + [0] * (len(BOUNDS) + 1)
+        counters[_STARTED] += 1
+        return counters, time.perf_counter()
+
+    def end(self, counters, start, failed):
+        """Record the end of the call started at start."""
+
+        elapsed = time.perf_counter() - start
+        counters[_FINISHED] += 1
+        if failed:
+            counters[_ERRORS] += 1
+        counters[_TIME] += elapsed
+        counters[_BUCKETS + bisect.bisect_left(BOUNDS, elapsed)] += 1
+
+    def snapshot(self):
+        """Add up the counters of all the threads.
+
+        Return a dictionary, by method, of dictionaries with the keys
+        calls, errors, inflight, total_time and buckets. buckets lists
+        the number of calls in each latency bucket, see BOUNDS.
+
+        """
+
+        totals = {}
+        self.lock.acquire()
+        try:
+            self._retire()
+            _add(totals, self.retired)
+            shards = [shard for thread, shard in self.shards]
+        finally:
+            self.lock.release()
+
+        for shard in shards:
+            _add(totals, shard)
+
+        return {
+            method: {
+                "calls": c[_FINISHED],
+                "errors": c[_ERRORS],
+                "inflight": c[_STARTED] - c[_FINISHED],
+                "total_time": c[_TIME],
+                "buckets": c[_BUCKETS:]
+            }
+            for method, c in totals.items()
+        }
+
+
+def _add(totals, shard):
+    """Add the counters of shard to those of totals, by method."""
+
+    for method, counters in list(shard.items()):
+        total = totals.get(method)
+        if total is None:
+            totals[method] = list(counters)
+        else:
+            for i, value in enumerate(counters):
+                total[i] += value
+
+
+def report(snapshot):
+    """Format a snapshot as a table, one line per method."""
+
+    lines = ["{:<20} {:>8} {:>6} {:>8} {:>10} {:>10}".format(
+        "method", "calls", "errors", "inflight", "mean (ms)", "p99 (ms)")]
+    for method in sorted(snapshot.keys()):
+        s = snapshot[method]
+        mean = 1000 * s["total_time"] / s["calls"] if s["calls"] else 0.0
+        lines.append("{:<20} {:>8} {:>6} {:>8} {:>10.3f} {:>10}".format(
+            method, s["calls"], s["errors"], s["inflight"], mean,
+            _percentile(s["buckets"], 0.99)))
+    return "\n".join(lines)
+
+
+def _percentile(buckets, q):
+    """Return the upper bound, in ms, of the bucket holding quantile q."""
+
+    count = sum(buckets)
+    if count == 0:
+        return "-"
+    seen = 0
+    for i, n in enumerate(buckets):
+        seen = seen + n
+        if seen >= q * count:
+            if i == len(BOUNDS):
+                return ">{:g}".format(1000 * BOUNDS[-1])
+            return "{:g}".format(1000 * BOUNDS[i])
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Modified: 16 October 2026
+#
+# Copyright 2012-2015 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Assemble the spans recorded by several processes into timelines.
+
+Each process appends its spans to a JSON-lines file (see tracing.py,
+e.g. DISTR_TRACE_FILE=trace_$i.jsonl). Give all the files to this script
+to get, for each trace, the tree of its spans with their start offsets
+and durations:
+
+    traceView.py trace_*.jsonl
+    traceView.py --slowest 5 trace_*.jsonl
+    traceView.py --trace 3fa1c2d4e5f60718 trace_*.jsonl
+
+Spans from different machines are placed using their clocks, so small
+offsets between processes on different hosts are to be expected.
+
+"""
+
+import sys
+import json
+import argparse
+
+# -----------------------------------------------------------------------------
+# Initialize and read the command line arguments
+# -----------------------------------------------------------------------------
+
+description = """\
+Assemble recorded spans into per-request timelines.\
+"""
+parser = argparse.ArgumentParser(description=description)
+parser.add_argument(
+    "files", metavar="FILE", nargs="+",
+    help="JSON-lines span files written by the processes."
+)
+parser.add_argument(
+    "-t", "--trace", metavar="TRACE", dest="trace",
+    help="Only show the trace with this id."
+)
+parser.add_argument(
+    "-s", "--slowest", metavar="COUNT", dest="slowest", type=int,
+    help="Only show the COUNT slowest traces."
+)
+parser.add_argument(
+    "-w", "--width", metavar="WIDTH", dest="width", type=int, default=40,
+    help="Width of the timeline bars. Default: 40."
+)
+opts = parser.parse_args()
+
+# -----------------------------------------------------------------------------
+# Auxiliary functions
+# -----------------------------------------------------------------------------
+
+
+def load(files):
+    """Return the spans of all the files, grouped by trace id."""
+
+    traces = {}
+    for name in files:
+        with open(name, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    span = json.loads(line)
+                except ValueError:
+                    # A process killed while writing leaves half a line.
+                    continue
+                traces.setdefault(span["trace"], []).append(span)
+    return traces
+
+
+def extent(spans):
+    start = min(s["start"] for s in spans)
+    end = max(s["start"] + s["duration"] for s in spans)
+    return start, end
+
+
+def show(trace, spans, width):
+    start, end = extent(spans)
+    total = max(end - start, 1e-9)
+    ids = set(s["span"] for s in spans)
+    children = {}
+    for s in spans:
+        # Spans whose parent was not recorded are shown as roots.
+        parent = s["parent"] if s["parent"] in ids else None
+        children.setdefault(parent, []).append(s)
+
+    print("trace {}  {:.3f} ms, {} spans".format(
+        trace, 1000 * total, len(spans)))
+
+    def walk(parent, depth):
+        for s in sorted(children.get(parent, []), key=lambda s: s["start"]):
+            offset = s["start"] - start
+            first = int(width * offset / total)
+            length = max(1, int(width * s["duration"] / total))
+            bar = " " * first + "#" * min(length, width - first)
+            label = "{}{} {} [{}]{}".format(
+                "  " * depth, s["kind"][0].upper(), s["name"], s["process"],
+                " ERROR" if s["error"] else "")
+            print("  {:<{w}} |{:<{b}}| +{:8.3f} {:8.3f} ms".format(
+                label, bar, 1000 * offset, 1000 * s["duration"],
+                w=48, b=width))
+            walk(s["span"], depth + 1)
+
+    walk(None, 0)
+    print("")
+
+# -----------------------------------------------------------------------------
+# The main program
+# -----------------------------------------------------------------------------
+
+traces = load(opts.files)
+
+if opts.trace is not None:
+    if opts.trace not in traces:
+        sys.exit("No spans for trace {}".format(opts.trace))
+    selected = [opts.trace]
+else:
+    selected = sorted(traces.keys(), key=lambda t: extent(traces[t])[0])
+    if opts.slowest is not None:
+        def length(t):
+            start, end = extent(traces[t])
+            return end - start
+        selected = sorted(selected, key=length, reverse=True)
+        selected = selected[:opts.slowest]
+
+for trace in selected:
+    show(trace, traces[trace], opts.width)
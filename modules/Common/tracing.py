@@ -0,0 +1,199 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Modified: 16 October 2026
+#
+# Copyright 2012-2015 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Trace context propagation across remote calls.
+
+Every remote call is a span: the caller records a "client" span for the
+time it waits for the reply and the callee a "server" span for the time
+it runs the method. Spans belong to a trace and have a parent, so a
+client write in lab5 and everything it sets off (token requests, token
+transfer, replication) end up in one tree.
+
+The current span is kept in a context variable. The Stub sends the
+trace id and its span id along with each request and the server makes
+its span the current one while it runs the method, so the calls the
+method makes in turn become its children. Code that hands work to other
+threads must carry the context over itself (contextvars.copy_context).
+
+Finished spans are kept in a ring buffer of the last capacity spans
+and, if a file is configured (configure() or DISTR_TRACE_FILE), appended
+to it as JSON lines. traceView.py puts the files of several processes
+back together into per-request timelines.
+
+"""
+
+import os
+import json
+import time
+import atexit
+import random
+import socket
+import threading
+import contextvars
+import collections
+
+_current = contextvars.ContextVar("span", default=None)
+_random = random.Random()
+
+
+class Span(object):
+
+    """A timed operation that is part of a trace."""
+
+    __slots__ = ("trace", "span", "parent", "name", "kind", "peer", "start",
+                 "duration", "error")
+
+    def __init__(self, name, kind, trace, parent, peer=None):
+        self.trace = trace
+        self.span = new_id()
+        self.parent = parent
+        self.name = name
+        self.kind = kind
+        self.peer = peer
+        self.start = time.time()
+        self.duration = None
+        self.error = False
+
+    def context(self):
+        """The part of the span that goes along with a request."""
+
+        return [self.trace, self.span]
+
+    def record(self):
+        return {
+            "trace": self.trace,
+            "span": self.span,
+            "parent": self.parent,
+            "name": self.name,
+            "kind": self.kind,
+            "process": recorder.process,
+            "peer": self.peer,
+            "start": self.start,
+            "duration": self.duration,
+            "error": self.error
+        }
+
+
+class Recorder(object):
+
+    """Keep the finished spans in a ring buffer and, optionally, a file."""
+
+    def __init__(self, capacity=4096):
+        self.lock = threading.Lock()
+        self.spans = collections.deque(maxlen=capacity)
+        self.file = None
+        self.process = "{}:{}".format(socket.gethostname(), os.getpid())
+
+    def configure(self, file=None, capacity=None, process=None):
+        self.lock.acquire()
+        try:
+            if capacity is not None:
+                self.spans = collections.deque(self.spans, maxlen=capacity)
+            if process is not None:
+                self.process = process
+            if file is not None:
+                if self.file is not None:
+                    self.file.close()
+                self.file = open(file, "a")
+        finally:
+            self.lock.release()
+
+    def add(self, span):
+        self.spans.append(span)
+        if self.file is not None:
+            line = json.dumps(span.record()) + "\n"
+            self.lock.acquire()
+            try:
+                if self.file is not None:
+                    self.file.write(line)
+            finally:
+                self.lock.release()
+
+    def recent(self, count=None):
+        """Return the records of the last count spans, oldest first."""
+
+        spans = list(self.spans)
+        if count is not None:
+            spans = spans[-count:]
+        return [s.record() for s in spans]
+
+    def close(self):
+        self.lock.acquire()
+        try:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+        finally:
+            self.lock.release()
+
+
+def new_id():
+    return "{:016x}".format(_random.getrandbits(64))
+
+
+def current():
+    return _current.get()
+
+
+def valid_context(context):
+    """Tell whether context is a [trace, span] pair of ids."""
+
+    return (isinstance(context, (list, tuple)) and len(context) == 2 and
+            all(isinstance(i, str) for i in context))
+
+
+def start_span(name, kind, parent=None, peer=None, activate=True):
+    """Start a span and make it the current one.
+
+    parent is the [trace, span] context sent by the caller. Without it,
+    or if it is malformed, the span is a child of the current span, or
+    starts a new trace.
+
+    Return the span and the token to give back to finish(). Spans that
+    finish in another thread or context than the one they started in
+    (asynchronous calls) must not become current: with activate unset
+    the token is None.
+
+    """
+
+    if not valid_context(parent):
+        parent = None
+    if parent is None:
+        outer = _current.get()
+        if outer is not None:
+            parent = outer.context()
+    if parent is None:
+        span = Span(name, kind, new_id(), None, peer)
+    else:
+        span = Span(name, kind, parent[0], parent[1], peer)
+    if not activate:
+        return span, None
+    return span, _current.set(span)
+
+
+def finish(span, token, error=False):
+    """End span, restore the previous current span and record it."""
+
+    span.duration = time.time() - span.start
+    span.error = error
+    if token is not None:
+        _current.reset(token)
+    recorder.add(span)
+
+
+def configure(file=None, capacity=None, process=None):
+    """Set the file the spans go to, the ring buffer size, or the name
+    this process goes by in the timelines."""
+
+    recorder.configure(file, capacity, process)
+
+
+recorder = Recorder()
+atexit.register(recorder.close)
+if os.environ.get("DISTR_TRACE_FILE"):
+    configure(file=os.environ["DISTR_TRACE_FILE"])
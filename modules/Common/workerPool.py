@@ -0,0 +1,109 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Modified: 16 October 2026
+#
+# Copyright 2012-2015 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Fixed-size pool of worker threads with admission control.
+
+Servers hand the work they receive to the pool instead of starting one
+thread per request. The pool has a bounded queue and a cap on the number
+of tasks each client may have queued or running; work that does not fit
+is refused straight away with a ServerBusyError, which the server sends
+back to the caller.
+
+"""
+
+import sys
+import queue
+import threading
+import traceback
+
+
+class ServerBusyError(Exception):
+    pass
+
+
+class WorkerPool(object):
+
+    """Run tasks on a fixed number of threads fed from a bounded queue.
+
+    Public methods:
+        --  __init__(workers, queue_size, per_client)
+        --  submit(client, function, *args)
+        --  load()
+
+    """
+
+    def __init__(self, workers=16, queue_size=64, per_client=16):
+        self.per_client = per_client
+        self.tasks = queue.Queue(queue_size)
+        self.lock = threading.Lock()
+        self.active = {}
+        self.workers = []
+        for i in range(workers):
+            t = threading.Thread(target=self._work)
+            t.daemon = True
+            t.start()
+            self.workers.append(t)
+
+    # Private methods
+
+    def _done(self, client):
+        self.lock.acquire()
+        try:
+            n = self.active[client] - 1
+            if n == 0:
+                del self.active[client]
+            else:
+                self.active[client] = n
+        finally:
+            self.lock.release()
+
+    def _work(self):
+        while True:
+            client, function, args = self.tasks.get()
+            try:
+                function(*args)
+            except Exception:
+                # A failing task must not take the worker down with it.
+                traceback.print_exc(file=sys.stderr)
+            finally:
+                self._done(client)
+
+    # Public methods
+
+    def submit(self, client, function, *args):
+        """Queue function(*args) on behalf of client.
+
+        Raise ServerBusyError if the client already has per_client tasks
+        queued or running, or if the queue is full.
+
+        """
+
+        self.lock.acquire()
+        try:
+            n = self.active.get(client, 0)
+            if self.per_client is not None and n >= self.per_client:
+                raise ServerBusyError(
+                    "Too many requests from {}".format(client))
+            self.active[client] = n + 1
+        finally:
+            self.lock.release()
+
+        try:
+            self.tasks.put_nowait((client, function, args))
+        except queue.Full:
+            self._done(client)
+            raise ServerBusyError("Server busy, try again later")
+
+    def load(self):
+        """Return the number of queued tasks and of clients with tasks."""
+
+        self.lock.acquire()
+        try:
+            return (self.tasks.qsize(), len(self.active))
+        finally:
+            self.lock.release()
@@ -28,6 +28,10 @@ The implementation should satisfy the following requests:
 
 """
 
+import time
+import threading
+from Common import stats
+
 NO_TOKEN = 0
 TOKEN_PRESENT = 1
 TOKEN_HELD = 2
@@ -43,7 +47,7 @@ class DistributedLock(object):
         --  destroy()
         --  register_peer(pid)
         --  unregister_peer(pid)
-        --  acquire()
+        --  acquire(timeout)
         --  release()
         --  request_token(time, pid)
         --  obtain_token(token)
@@ -58,6 +62,12 @@ class DistributedLock(object):
         self.token = None
         self.request = {}
         self.state = NO_TOKEN
+        # True while a request for the token is out, until it comes.
+        self.requested = False
+        # The number of calls to acquire() under way.
+        self.waiting = 0
+        # How long the calls to acquire() waited for the token.
+        self.wait_stats = stats.MethodStats()
 
     def _prepare(self, token):
         """Prepare the token to be sent as a JSON message.
@@ -72,6 +82,16 @@ class DistributedLock(object):
         """The reverse operation to the one above."""
         return dict(token)        
 
+    def _pass_on(self):
+        """Give the token to whoever asked for it, unless we need it."""
+
+        self.peer_list.lock.acquire()
+        try:
+            if self.state == TOKEN_PRESENT and self.waiting == 0:
+                self.release()
+        finally:
+            self.peer_list.lock.release()
+
     # Public methods
 
     def initialize(self):
@@ -170,50 +190,69 @@ class DistributedLock(object):
         finally:
             self.peer_list.lock.release()
 
-    def acquire(self):
-        """Called when this object tries to acquire the lock."""
+    def acquire(self, timeout=None):
+        """Called when this object tries to acquire the lock.
+
+        Wait at most timeout seconds (forever if None) for the token.
+        Return True if we got it, False otherwise.
+
+        """
         print("Trying to acquire the lock...")
 
+        counters, start = self.wait_stats.begin("acquire")
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+
         self.peer_list.lock.acquire()
-            
+        self.waiting = self.waiting + 1
         try:
-
-            # if we don't have the  token, we have to request it
-            if self.state == NO_TOKEN:
-                # Go through all peers in the system other than us
-                pids = sorted(self.peer_list.peers.keys())
-                for pid in pids:
-                    if pid == self.owner.id:
-                        continue
+            while True:
+                # The token may have been taken away since we last
+                # looked; ask for it unless we already did.
+                if self.state == NO_TOKEN and not self.requested:
+                    # Increment our clock before sending the request
+                    self.time = self.time + 1
+                    request_time = self.time
+                    # Set before the broadcast: the token may arrive
+                    # before it returns, see obtain_token().
+                    self.requested = True
+                    self.peer_list.lock.release()
                     try:
-                        # Increment our clock before sending a message
-                        self.time = self.time + 1
-
-
-                        # The lock must be unlocked during the request or we will
-                        # will need the lock here AND in obtain_token()
-                        # as we wait for a reply but the token holder also wait for ours
-                        peer = self.peer_list.peers[pid]
-                        self.peer_list.lock.release()
-
                         # Send the request message with our clock and id
-                        peer.request_token(self.time, self.owner.id)
-
+                        # to all the other peers at once. The lock must
+                        # be unlocked during the requests as the token
+                        # holder calls obtain_token() on us before
+                        # replying. Peers that cannot be reached are
+                        # skipped.
+                        self.peer_list.broadcast("request_token",
+                                                 request_time, self.owner.id)
+                    finally:
                         self.peer_list.lock.acquire()
-                    except:
-                        pass
+                    continue
+
+                if self.state != NO_TOKEN:
+                    # update our state : the token is now locked
+                    self.state = TOKEN_HELD
+                    acquired = True
+                    break
+
+                # wait for the token, obtain_token() wakes us up
+                left = None
+                if deadline is not None:
+                    left = deadline - time.time()
+                    if left <= 0:
+                        acquired = False
+                        break
+                self.peer_list.lock.wait(left)
         finally:
+            self.waiting = self.waiting - 1
             self.peer_list.lock.release()
 
-        # wait for the token
-        # Active waiting... bad, should be modified later
-        while self.state == NO_TOKEN:
-            pass
-
-        # update our state : the token is now locked
-        self.peer_list.lock.acquire()
-        self.state = TOKEN_HELD
-        self.peer_list.lock.release()
+        # If the token comes after we gave up, obtain_token() passes it
+        # on to the peers that asked for it meanwhile.
+        self.wait_stats.end(counters, start, not acquired)
+        return acquired
 
 
     def release(self):
@@ -316,10 +355,20 @@ class DistributedLock(object):
             # Update our status and save the token
             self.token = self._unprepare(token)
             self.state = TOKEN_PRESENT
+            self.requested = False
+            self.peer_list.lock.notify_all()
 
             # Update our logical clock
             self.time = max (self.time + 1, self.token[self.owner.id])
 
+            if self.waiting == 0:
+                # Our acquire() gave up; the peers that asked meanwhile
+                # will not ask again. Pass it on once the sender, which
+                # waits for us holding its lock, is done.
+                t = threading.Thread(target=self._pass_on)
+                t.daemon = True
+                t.start()
+
         finally:
             self.peer_list.lock.release()
 
@@ -339,5 +388,7 @@ class DistributedLock(object):
             print("Request :: {0}".format(self.request))
             print("Token   :: {0}".format(self.token))
             print("Time    :: {0}".format(self.time))
+            print("Waits   ::")
+            print(stats.report(self.wait_stats.snapshot()))
         finally:
             self.peer_list.lock.release()
@@ -9,39 +9,86 @@
 
 """Class implementing a distributed version of ReadWriteLock."""
 
-import threading
+import time
+from Common import lockStats
 from . import readWriteLock
 
 
 class DistributedReadWriteLock(readWriteLock.ReadWriteLock):
 
-    """Distributed version of ReadWriteLock."""
+    """Distributed version of ReadWriteLock.
 
-    def __init__(self, distributed_lock):
-        readWriteLock.ReadWriteLock.__init__(self)
+    policy is the local policy, see ReadWriteLock.
+
+    """
+
+    def __init__(self, distributed_lock, policy=readWriteLock.READER):
+        readWriteLock.ReadWriteLock.__init__(self, policy, "drwlock")
         # Create a distributed lock
         self.distributed_lock = distributed_lock
         
         #Create a lock protecting the distributed lock acquiring
-        self.distributed_lock_access = threading.Lock()
+        self.distributed_lock_access = lockStats.Lock(
+            "distributed_lock_access")
 
         pass
 
     # Public methods
 
-    def write_acquire(self):
+    def token_acquire(self, timeout=None):
+        """Obtain access to the rest of the peers only.
+
+        Holding the token serializes the writers of all the peers but,
+        unlike write_acquire, leaves the local readers alone. Give up
+        after timeout seconds, if given, and return False; return True
+        otherwise.
+
+        """
+        if timeout is None:
+            self.distributed_lock_access.acquire()
+        else:
+            deadline = time.time() + timeout
+            if not self.distributed_lock_access.acquire(timeout=timeout):
+                return False
+            timeout = max(0, deadline - time.time())
+
+        if not self.distributed_lock.acquire(timeout):
+            self.distributed_lock_access.release()
+            return False
+
+        return True
+
+    def token_release(self):
+        self.distributed_lock.release()
+        self.distributed_lock_access.release()
+
+    def try_write_acquire(self, timeout=None):
         """Acquire the rights to write into the database.
 
-        Override the write_acquire method to include obtaining access
-        to the rest of the peers.
+        Override the try_write_acquire method to include obtaining
+        access to the rest of the peers. Give up after timeout seconds,
+        if given, and return False; return True otherwise.
 
         """
-        self.distributed_lock_access.acquire()
-        self.distributed_lock.acquire()
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
 
-        readWriteLock.ReadWriteLock.write_acquire(self)
+        if not self.token_acquire(timeout):
+            return False
 
-        pass
+        if deadline is not None:
+            timeout = max(0, deadline - time.time())
+        if not readWriteLock.ReadWriteLock.try_write_acquire(self, timeout):
+            self.token_release()
+            return False
+
+        return True
+
+    def write_acquire(self, timeout=None):
+        """As try_write_acquire."""
+
+        return self.try_write_acquire(timeout)
 
     def write_release(self):
         """Release the rights to write into the database.
@@ -50,15 +97,14 @@ class DistributedReadWriteLock(readWriteLock.ReadWriteLock):
         to the rest of the peers.
 
         """        
-        self.distributed_lock.release()
-        self.distributed_lock_access.release()
+        self.token_release()
 
         readWriteLock.ReadWriteLock.write_release(self)
         
         pass
 
     def write_acquire_local(self):
-        readWriteLock.ReadWriteLock.write_acquire(self)
+        readWriteLock.ReadWriteLock.try_write_acquire(self)
 
     def write_release_local(self):
         readWriteLock.ReadWriteLock.write_release(self)
@@ -9,7 +9,18 @@
 
 """Class implementing a readers-writers lock."""
 
+import time
 import threading
+import contextlib
+import collections
+from Common import lockStats
+
+# Who goes first when both readers and writers wait.
+READER = "reader"
+WRITER = "writer"
+FAIR = "fair"
+
+policies = (READER, WRITER, FAIR)
 
 
 class ReadWriteLock(object):
@@ -25,31 +36,178 @@ class ReadWriteLock(object):
             reading the resource,
         --  only one writer is allowed to modify the resource and all
             other existing readers and writers are blocked.
+
+    The policy says who goes first:
+        --  reader :: new readers join the readers in, waiting writers
+                      wait for a moment without readers (which may
+                      never come),
+        --  writer :: new readers wait as long as a writer waits,
+                      readers may starve instead,
+        --  fair   :: readers and writers take turns: the readers that
+                      wait when a writer leaves all get in, then the
+                      next writer, in order of arrival.
+    Writers always get in one at a time in order of arrival.
+
+    With lock statistics enabled (see lockStats), the readers and the
+    writers are recorded as name + ".read" and name + ".write"; the hold
+    time of the readers is the time during which any reader is in.
+
     """
 
-    def __init__(self):
+    def __init__(self, policy=READER, name="rwlock"):
+        if policy not in policies:
+            raise ValueError("Unknown policy: '{}'".format(policy))
+        self.policy = policy
+        self.read_stats = lockStats.get(name + ".read")
+        self.write_stats = lockStats.get(name + ".write")
+        self.read_since = 0.0
+        self.write_since = 0.0
+        self.cond = threading.Condition(threading.Lock())
         self.reader_count = 0
-        self.reader_lock = threading.Lock()
-        self.writer_lock = threading.Lock()
+        self.writer_active = False
+        # Tickets of the waiting writers, in order of arrival.
+        self.writers = collections.deque()
+        # Readers waiting for their turn (fair policy). A writer leaving
+        # lets them all in at once and bumps the phase.
+        self.waiting_readers = 0
+        self.phase = 0
+
+    # Private methods
+
+    def _writer_ahead(self):
+        return self.writer_active or len(self.writers) > 0
 
     # Public methods
 
+    def try_read_acquire(self, timeout=None):
+        """Acquire the lock for reading.
+
+        Give up after timeout seconds, if given. Return True if the lock
+        was acquired, False otherwise.
+
+        """
+
+        if self.read_stats is not None:
+            start = self.read_stats.waiting()
+
+        self.cond.acquire()
+        try:
+            if self.policy == READER:
+                acquired = self.cond.wait_for(
+                    lambda: not self.writer_active, timeout)
+            elif self.policy == WRITER or not self._writer_ahead():
+                acquired = self.cond.wait_for(
+                    lambda: not self._writer_ahead(), timeout)
+            else:
+                phase = self.phase
+                self.waiting_readers = self.waiting_readers + 1
+                acquired = self.cond.wait_for(
+                    lambda: self.phase != phase or not self._writer_ahead(),
+                    timeout)
+                if self.phase != phase:
+                    # The writer counted us in.
+                    acquired = None
+                else:
+                    self.waiting_readers = self.waiting_readers - 1
+
+            if acquired:
+                self.reader_count = self.reader_count + 1
+            if acquired is None:
+                acquired = True
+            elif acquired and self.reader_count == 1 and \
+                    self.read_stats is not None:
+                self.read_since = time.perf_counter()
+        finally:
+            self.cond.release()
+
+        if self.read_stats is not None:
+            self.read_stats.acquired(start, acquired)
+        return acquired
+
+    def try_write_acquire(self, timeout=None):
+        """Acquire the lock for writing.
+
+        Give up after timeout seconds, if given. Return True if the lock
+        was acquired, False otherwise.
+
+        """
+
+        if self.write_stats is not None:
+            start = self.write_stats.waiting()
+
+        self.cond.acquire()
+        try:
+            ticket = object()
+            self.writers.append(ticket)
+            acquired = self.cond.wait_for(
+                lambda: not self.writer_active and self.reader_count == 0 and
+                self.writers[0] is ticket, timeout)
+            self.writers.remove(ticket)
+            if acquired:
+                self.writer_active = True
+            else:
+                # Those waiting behind us may go now.
+                self.cond.notify_all()
+        finally:
+            self.cond.release()
+
+        if self.write_stats is not None:
+            since = self.write_stats.acquired(start, acquired)
+            # A writer that gave up must not touch the hold time of the
+            # one holding the lock.
+            if acquired:
+                self.write_since = since
+        return acquired
+
     def read_acquire(self):
-        self.reader_lock.acquire()
-        if self.reader_count == 0:
-            self.writer_lock.acquire()
-        self.reader_count = self.reader_count + 1
-        self.reader_lock.release()
+        self.try_read_acquire()
 
     def read_release(self):
-        self.reader_lock.acquire()
-        self.reader_count = self.reader_count - 1
-        if self.reader_count == 0:
-            self.writer_lock.release()
-        self.reader_lock.release()
+        self.cond.acquire()
+        try:
+            self.reader_count = self.reader_count - 1
+            if self.reader_count == 0:
+                self.cond.notify_all()
+                if self.read_stats is not None:
+                    self.read_stats.released(self.read_since)
+        finally:
+            self.cond.release()
 
     def write_acquire(self):
-        self.writer_lock.acquire()
+        self.try_write_acquire()
 
     def write_release(self):
-        self.writer_lock.release()
+        self.cond.acquire()
+        try:
+            self.writer_active = False
+            if self.write_stats is not None:
+                self.write_stats.released(self.write_since)
+            if self.policy == FAIR and self.waiting_readers:
+                self.reader_count = self.reader_count + self.waiting_readers
+                self.waiting_readers = 0
+                self.phase = self.phase + 1
+                if self.read_stats is not None:
+                    self.read_since = time.perf_counter()
+            self.cond.notify_all()
+        finally:
+            self.cond.release()
+
+    @contextlib.contextmanager
+    def reading(self):
+        """Context manager holding the lock for reading."""
+
+        self.read_acquire()
+        try:
+            yield self
+        finally:
+            self.read_release()
+
+    @contextlib.contextmanager
+    def writing(self):
+        """Context manager holding the lock for writing."""
+
+        self.write_acquire()
+        try:
+            yield self
+        finally:
+            self.write_release()
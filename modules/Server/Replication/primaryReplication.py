@@ -0,0 +1,197 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Modified: 16 October 2026
+#
+# Copyright 2012-2015 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Module for the primary-backup replication of the database.
+
+The peer with the smallest id is the primary; it orders all the writes.
+A write arriving at a backup is forwarded to the primary, which gives it
+the next sequence number, writes it and sends it to all the backups at
+once. The backups write the updates in the order of their numbers,
+holding back those that arrive ahead of their turn. A write then costs
+one round trip to the primary plus the replication, however many
+replicas there are, instead of the token requests and transfer of the
+distributed lock.
+
+When the primary leaves, the peer with the next smallest id takes over
+and goes on numbering from the updates it has. As for the token in
+distributedLock, a primary dying with updates in flight is not handled.
+
+A joining replica starts counting from the number the primary is at
+when it asks; the writes made before that are not sent to it.
+
+"""
+
+from Common import lockStats
+
+
+class PrimaryReplication(object):
+
+    """Primary-backup replication of a database among a list of peers.
+
+    timeout bounds the wait of a backup for the updates ahead of one
+    that arrived.
+
+    Public methods:
+        --  initialize()
+        --  primary()
+        --  write(fortune)
+        --  sequence(fortune)
+        --  apply_update(seq, fortune)
+        --  sequence_number()
+        --  display_status()
+
+    """
+
+    def __init__(self, owner, peer_list, db, rwlock, timeout=5.0):
+        self.owner = owner
+        self.peer_list = peer_list
+        self.db = db
+        # Only its local part: the updates are handed to the database
+        # under it, like those of write_local.
+        self.rwlock = rwlock
+        self.timeout = timeout
+        self.cond = lockStats.Condition("sequencer")
+        # The number of the last update written, None until initialize()
+        # learned where the group is at.
+        self.applied = None
+        # Updates arrived ahead of their turn, by number.
+        self.held = {}
+
+    # Private methods
+
+    def _drain(self):
+        """Write the held updates that are next in turn.
+
+        Return their tickets. Call with cond held.
+
+        """
+
+        ready = []
+        while self.applied is not None and self.applied + 1 in self.held:
+            self.applied = self.applied + 1
+            ready.append(self.held.pop(self.applied))
+        if not ready:
+            return []
+
+        self.rwlock.write_acquire_local()
+        try:
+            tickets = [self.db.submit(fortune) for fortune in ready]
+        finally:
+            self.rwlock.write_release_local()
+        self.cond.notify_all()
+        return tickets
+
+    # Public methods
+
+    def initialize(self):
+        """Learn the number of the last update from the primary.
+
+        Call after the peer list is initialized, so that the primary
+        already sends us the updates that follow.
+
+        """
+
+        pid = self.primary()
+        if pid == self.owner.id:
+            seq = 0
+        else:
+            seq = self.peer_list.peer(pid).sequence_number()
+
+        self.cond.acquire()
+        try:
+            self.applied = seq
+            for old in [s for s in self.held if s <= seq]:
+                del self.held[old]
+            tickets = self._drain()
+        finally:
+            self.cond.release()
+        for ticket in tickets:
+            ticket.wait()
+
+    def primary(self):
+        """Return the id of the primary."""
+
+        return min(list(self.peer_list.get_peers()) + [self.owner.id])
+
+    def write(self, fortune):
+        """Write fortune through the primary."""
+
+        pid = self.primary()
+        if pid == self.owner.id:
+            self.sequence(fortune)
+        else:
+            self.peer_list.peer(pid).sequence(fortune)
+
+    def sequence(self, fortune):
+        """Number fortune, write it and send it to the backups.
+
+        Called on the primary only. Return the number of the update.
+
+        """
+
+        if self.primary() != self.owner.id:
+            raise Exception("Peer {} is not the primary".format(
+                self.owner.id))
+
+        self.cond.acquire()
+        try:
+            seq = self.applied + 1
+            self.held[seq] = fortune
+            tickets = self._drain()
+        finally:
+            self.cond.release()
+
+        responses = self.peer_list.broadcast("apply_update", seq, fortune)
+        for pid in sorted(responses.keys()):
+            if responses[pid].error is not None:
+                print("could not ask a server to write : " + str(pid))
+
+        for ticket in tickets:
+            ticket.wait()
+        return seq
+
+    def apply_update(self, seq, fortune):
+        """Write update seq once those before it are written.
+
+        Called by the primary. Raise an exception if the earlier updates
+        do not arrive in time.
+
+        """
+
+        self.cond.acquire()
+        try:
+            if self.applied is None or seq > self.applied:
+                self.held[seq] = fortune
+            tickets = self._drain()
+            arrived = self.cond.wait_for(
+                lambda: self.applied is not None and self.applied >= seq,
+                self.timeout)
+        finally:
+            self.cond.release()
+        for ticket in tickets:
+            ticket.wait()
+        if not arrived:
+            raise Exception("Missing updates before {}".format(seq))
+
+    def sequence_number(self):
+        """Return the number of the last update written here."""
+
+        self.cond.acquire()
+        try:
+            return self.applied
+        finally:
+            self.cond.release()
+
+    def display_status(self):
+        self.cond.acquire()
+        try:
+            print("Primary-backup replication: primary {}, {} updates "
+                  "written, {} held back.".format(
+                      self.primary(), self.applied, len(self.held)))
+        finally:
+            self.cond.release()
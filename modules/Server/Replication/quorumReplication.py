@@ -0,0 +1,299 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Modified: 16 October 2026
+#
+# Copyright 2012-2015 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Module for the quorum (W of N) replication of the database.
+
+Instead of taking the token and writing to all the replicas, a replica
+writes a fortune locally, sends it to all the other replicas at once and
+returns as soon as W replicas in all (itself included) have it. A read
+first asks R replicas (itself included) which writes they have, fetches
+the ones it misses and sends the others what they miss (read-repair),
+then reads locally. With R + W > N every read quorum meets every write
+quorum, so a read sees all the writes that returned before it started.
+
+Writes are numbered by the replica they come from (their origin), from
+1 up; the version of a replica is the list of (origin, count) pairs of
+the writes it has, which are always the first count writes of each
+origin. A write arriving ahead of an earlier one of the same origin is
+held back until the earlier one arrives, from its origin or through a
+read-repair.
+
+Fortunes from different origins may end up in the database files of the
+replicas in different orders: the replicas agree on the set of
+fortunes, which is all reads depend on.
+
+Each replica records which origin and number every fortune it writes
+has, by its index in the database, in a journal next to the database
+file (db_file + ".writes"). On a restart the journal tells which writes
+the replica has, so it neither fetches them again nor numbers its own
+writes from 1 again. Only the indexes are kept in memory, the fortunes
+are read back from the database to answer fetch_writes. A replica
+joining the group fetches all the writes made since the others
+started, on its first reads.
+
+"""
+
+import os
+import json
+from Common import orb
+from Common import lockStats
+
+# Appended to the name of the database file to name the journal.
+JOURNAL = ".writes"
+
+
+class QuorumReplication(object):
+
+    """W of N replication of a database among a list of peers.
+
+    write_quorum and read_quorum are W and R. Left out, W is a majority
+    of the peers present at the time and R the smallest number meeting
+    it. timeout bounds the wait for the other replicas.
+
+    Public methods:
+        --  write(fortune)
+        --  catch_up()
+        --  replicate(origin, seq, fortunes)
+        --  versions()
+        --  fetch_writes(origin, start)
+        --  display_status()
+
+    """
+
+    def __init__(self, owner, peer_list, db, rwlock, write_quorum=None,
+                 read_quorum=None, timeout=5.0):
+        self.owner = owner
+        self.peer_list = peer_list
+        self.db = db
+        # Only its local part: the writes are handed to the database
+        # under it, like those of write_local.
+        self.rwlock = rwlock
+        self.write_quorum = write_quorum
+        self.read_quorum = read_quorum
+        self.timeout = timeout
+        self.cond = lockStats.Condition("quorum")
+        # The database indexes of the fortunes written by each origin,
+        # in order.
+        self.log = {}
+        # Fortunes arrived ahead of their turn, by origin and number.
+        self.held = {}
+        self.warned = None
+        # The index the next fortune written gets.
+        self.size = len(db)
+        self.journal = self._load_journal(db.db_file + JOURNAL)
+
+    # Private methods
+
+    def _load_journal(self, path):
+        """Rebuild the log from the journal at path and open it.
+
+        A journal that does not match the database, left over by another
+        database file, is started over.
+
+        """
+
+        entries = []
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+        if any(index >= self.size for origin, index in entries):
+            print("The journal {} does not match the database, starting "
+                  "it over.".format(path))
+            entries = []
+            os.remove(path)
+        for origin, index in entries:
+            self.log.setdefault(origin, []).append(index)
+        return open(path, "a")
+
+    def _quorums(self):
+        """Return N, W and R for the peers present now."""
+
+        peers = self.peer_list.get_peers()
+        n = len([pid for pid in peers if pid != self.owner.id]) + 1
+        w = self.write_quorum or n // 2 + 1
+        r = self.read_quorum or n - w + 1
+        w = min(w, n)
+        r = min(r, n)
+        if r + w <= n and self.warned != n:
+            print("Warning: R + W = {} does not exceed the {} replicas, "
+                  "reads may miss writes.".format(r + w, n))
+            self.warned = n
+        return n, w, r
+
+    def _apply(self, origin, seq, fortunes):
+        """Take in fortunes seq, seq + 1, ... of origin.
+
+        Those already there are skipped, those ahead of their turn held
+        back. Return the tickets of the fortunes handed to the database.
+        Call with cond held.
+
+        """
+
+        log = self.log.setdefault(origin, [])
+        held = self.held.setdefault(origin, {})
+        for i, fortune in enumerate(fortunes):
+            if seq + i > len(log):
+                held[seq + i] = fortune
+
+        ready = []
+        while len(log) + 1 in held:
+            ready.append(held.pop(len(log) + 1))
+            log.append(self.size)
+            self.journal.write(json.dumps([origin, self.size]) + "\n")
+            self.size = self.size + 1
+        if not ready:
+            return []
+        self.journal.flush()
+
+        self.rwlock.write_acquire_local()
+        try:
+            tickets = [self.db.submit(fortune) for fortune in ready]
+        finally:
+            self.rwlock.write_release_local()
+        self.cond.notify_all()
+        return tickets
+
+    def _version(self):
+        """Return the version of this replica as a dictionary."""
+
+        self.cond.acquire()
+        try:
+            return {origin: len(log) for origin, log in self.log.items()}
+        finally:
+            self.cond.release()
+
+    # Public methods
+
+    def write(self, fortune):
+        """Write fortune and return once W replicas have it.
+
+        Raise an exception if fewer replicas answered in time. The
+        fortune is not taken back then: it still reaches the others
+        through read-repair.
+
+        """
+
+        n, w, r = self._quorums()
+        origin = self.owner.id
+        self.cond.acquire()
+        try:
+            seq = len(self.log.get(origin, [])) + 1
+            tickets = self._apply(origin, seq, [fortune])
+        finally:
+            self.cond.release()
+
+        responses = self.peer_list.broadcast(
+            "replicate", origin, seq, [fortune], timeout=self.timeout,
+            wait=w - 1)
+        for ticket in tickets:
+            ticket.wait()
+
+        acks = len([pid for pid, response in responses.items()
+                    if response.done and response.error is None])
+        if acks < w - 1:
+            raise Exception(
+                "Only {} of the {} replicas needed have the fortune".format(
+                    acks + 1, w))
+
+    def catch_up(self):
+        """Bring this replica and R - 1 others up to date with each other.
+
+        Call before reading locally.
+
+        """
+
+        n, w, r = self._quorums()
+        if r <= 1:
+            return
+
+        responses = self.peer_list.broadcast(
+            "versions", timeout=self.timeout, wait=r - 1)
+        versions = {}
+        for pid, response in responses.items():
+            if response.done and response.error is None:
+                versions[pid] = dict(response.result)
+        if len(versions) < r - 1:
+            print("Only {} of the {} replicas needed answered the "
+                  "read".format(len(versions) + 1, r))
+
+        # Fetch what we miss from whoever has the most of it.
+        own = self._version()
+        for origin in set().union(*versions.values()):
+            pid = max(versions, key=lambda p: versions[p].get(origin, 0))
+            have = own.get(origin, 0)
+            if versions[pid].get(origin, 0) > have:
+                address = self.peer_list.peer(pid).address
+                fortunes = orb.Stub(address).fetch_writes(origin, have + 1)
+                self.cond.acquire()
+                try:
+                    tickets = self._apply(origin, have + 1, fortunes)
+                finally:
+                    self.cond.release()
+                for ticket in tickets:
+                    ticket.wait()
+
+        # Send the others what they miss, without waiting for them.
+        own = self._version()
+        for pid, version in versions.items():
+            address = self.peer_list.peer(pid).address
+            for origin, count in own.items():
+                have = version.get(origin, 0)
+                if have < count:
+                    orb.FutureStub(address).replicate(
+                        origin, have + 1, self.fetch_writes(origin, have + 1))
+
+    def replicate(self, origin, seq, fortunes):
+        """Take in fortunes seq, seq + 1, ... written by origin.
+
+        Return once they are all written, or raise an exception if the
+        earlier writes of origin do not arrive in time.
+
+        """
+
+        last = seq + len(fortunes) - 1
+        self.cond.acquire()
+        try:
+            tickets = self._apply(origin, seq, fortunes)
+            arrived = self.cond.wait_for(
+                lambda: len(self.log[origin]) >= last, self.timeout)
+        finally:
+            self.cond.release()
+        for ticket in tickets:
+            ticket.wait()
+        if not arrived:
+            raise Exception(
+                "Missing writes of {} before {}".format(origin, seq))
+
+    def versions(self):
+        """Return the version of this replica, as (origin, count) pairs."""
+
+        return list(self._version().items())
+
+    def fetch_writes(self, origin, start):
+        """Return the fortunes written by origin, from number start on."""
+
+        self.cond.acquire()
+        try:
+            indexes = self.log.get(origin, [])[start - 1:]
+        finally:
+            self.cond.release()
+        # They may still be on their way to the database.
+        self.db.flush()
+        return [self.db.fortunes(i, i + 1)[0] for i in indexes]
+
+    def display_status(self):
+        n, w, r = self._quorums()
+        print("Quorum replication: N = {}, W = {}, R = {}.".format(n, w, r))
+        self.cond.acquire()
+        try:
+            for origin in sorted(self.log.keys()):
+                print("    origin {:>2}: {} writes, {} held back".format(
+                    origin, len(self.log[origin]),
+                    len(self.held.get(origin, {}))))
+        finally:
+            self.cond.release()
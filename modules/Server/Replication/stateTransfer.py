@@ -0,0 +1,117 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Modified: 16 October 2026
+#
+# Copyright 2012-2015 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Module for copying the database of a replica to a joining one.
+
+The donor takes a snapshot of its database: the fortunes that can be
+read at that moment. As fortunes are only ever appended, the snapshot
+is the beginning of the fortune file, which stays as it is however many
+writes follow. The donor listens on a port of its own for the joiner
+and streams the snapshot to it over a plain socket, with sendfile when
+the file holds the fortunes as they are (everything but the segmented
+engine); otherwise the fortunes are written out in the fortune file
+format.
+
+The joiner writes the stream to its database file, then catches up with
+the writes made since the snapshot (see serverPeer).
+
+"""
+
+import os
+import shutil
+import socket
+import threading
+from Server.Storage import offsetIndex
+
+# Bytes read from the socket, or exported, at a time.
+CHUNK_SIZE = 2 ** 20
+
+
+def _export(db, count):
+    """Yield the first count fortunes of db in the fortune file format."""
+
+    chunk = []
+    size = 0
+    for start in range(0, count, 1024):
+        for fortune in db.fortunes(start, min(start + 1024, count)):
+            record = fortune.encode() + offsetIndex.SEPARATOR
+            chunk.append(record)
+            size = size + len(record)
+            if size >= CHUNK_SIZE:
+                yield b"".join(chunk)
+                chunk = []
+                size = 0
+    if chunk:
+        yield b"".join(chunk)
+
+
+def _send(listener, db, count, extent):
+    try:
+        conn, addr = listener.accept()
+    except OSError as e:
+        print("Nobody came for the snapshot: {}".format(e))
+        listener.close()
+        return
+    listener.close()
+    try:
+        if extent is not None:
+            with open(db.db_file, "rb") as f:
+                conn.sendfile(f, 0, extent)
+        else:
+            for chunk in _export(db, count):
+                conn.sendall(chunk)
+    except OSError as e:
+        print("Could not send the snapshot to {}: {}".format(addr, e))
+    finally:
+        conn.close()
+
+
+def serve(db, host, timeout=30.0):
+    """Offer a snapshot of db to the first peer connecting.
+
+    Listen on a free port of host for timeout seconds at most. Return
+    the address to connect to and the number of fortunes sent.
+
+    """
+
+    count = len(db)
+    extent = db.extent(count)
+    listener = socket.create_server((host, 0))
+    listener.settimeout(timeout)
+    threading.Thread(target=_send, args=(listener, db, count, extent),
+                     daemon=True).start()
+    return listener.getsockname()[:2], count
+
+
+def receive(address, db_file, timeout=30.0):
+    """Fetch a snapshot from address and make it db_file.
+
+    Whatever db_file held is replaced, along with its offset index and
+    segments. Return the number of bytes received.
+
+    """
+
+    tmp = db_file + ".tmp"
+    size = 0
+    with socket.create_connection(tuple(address), timeout) as conn:
+        with open(tmp, "wb") as out:
+            while True:
+                data = conn.recv(CHUNK_SIZE)
+                if not data:
+                    break
+                out.write(data)
+                size = size + len(data)
+            out.flush()
+            os.fsync(out.fileno())
+
+    os.replace(tmp, db_file)
+    if os.path.exists(offsetIndex.path(db_file)):
+        os.remove(offsetIndex.path(db_file))
+    if os.path.isdir(db_file + ".d"):
+        shutil.rmtree(db_file + ".d")
+    return size
@@ -0,0 +1,52 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Modified: 16 October 2026
+#
+# Copyright 2012-2015 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Storage engine keeping all the fortunes in one buffer."""
+
+import sys
+from array import array
+from . import store
+from . import groupCommit
+
+
+class CompactStore(store.Store):
+
+    """The UTF-8 text of all the fortunes, back to back, in one bytearray.
+
+    offsets[i] is where fortune i starts in the buffer and offsets[i + 1]
+    where it ends, so a fortune costs 8 bytes on top of its text. Only
+    the fortune that is read is decoded.
+
+    """
+
+    def __init__(self, db_file, durability=groupCommit.FLUSH):
+        self.data = bytearray()
+        self.offsets = array('Q', [0])
+        store.Store.__init__(self, db_file, durability)
+
+    # Private methods
+
+    def _add(self, fortune):
+        self.data += fortune.encode()
+        # The end offset goes in last: readers never see a fortune
+        # whose text is not in the buffer yet.
+        self.offsets.append(len(self.data))
+
+    # Public methods
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def get(self, index):
+        return self.data[self.offsets[index]:self.offsets[index + 1]].decode()
+
+    def extent(self, count):
+        return self.offsets[count] + 2 * count
+
+    def memory_usage(self):
+        return sys.getsizeof(self.data) + sys.getsizeof(self.offsets)
@@ -0,0 +1,233 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Modified: 16 October 2026
+#
+# Copyright 2012-2015 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Group commit of the records appended to a fortune file.
+
+Writers do not append to the file themselves: they queue their records
+and a single committer thread appends everything queued so far in one
+write, so concurrent writers share the cost of the write (and of the
+fsync). Each writer gets a Ticket to wait on.
+
+The durability levels say when a ticket is done:
+    --  none            :: right away, the record is written soon after,
+    --  flush           :: once the batch is handed to the kernel,
+    --  fsync-per-batch :: once the batch is on disk (one fsync per
+                           batch),
+    --  fsync-interval  :: as flush, and the file is fsynced at most
+                           interval seconds after a batch, so a crash
+                           loses at most the last interval seconds.
+
+"""
+
+import os
+import time
+import atexit
+import threading
+
+NONE = "none"
+FLUSH = "flush"
+FSYNC_BATCH = "fsync-per-batch"
+FSYNC_INTERVAL = "fsync-interval"
+
+levels = (NONE, FLUSH, FSYNC_BATCH, FSYNC_INTERVAL)
+
+
+class Ticket(object):
+
+    """The promise that a record gets written."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.error = None
+
+    def done(self, error=None):
+        self.error = error
+        self.event.set()
+
+    def wait(self):
+        """Wait until the record is as durable as requested.
+
+        Raise the error met while writing it, if any.
+
+        """
+
+        self.event.wait()
+        if self.error is not None:
+            raise self.error
+
+
+class GroupCommit(object):
+
+    """Append queued records to a file from a single committer thread.
+
+    on_write(items, ends) is called from the committer thread after each
+    batch is written, with the items given to submit() and the offsets
+    in the file where their records end, in order.
+
+    Public methods:
+        --  __init__(file_name, durability, on_write, interval)
+        --  submit(record, item)
+        --  flush()
+        --  rotate(file_name)
+        --  close()
+
+    """
+
+    def __init__(self, file_name, durability=FLUSH, on_write=None,
+                 interval=1.0):
+        if durability not in levels:
+            raise ValueError("Unknown durability: '{}'".format(durability))
+        self.durability = durability
+        self.on_write = on_write
+        self.interval = interval
+        self.file = open(file_name, "ab")
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        # Notified as batches are written, for flush().
+        self.written_cond = threading.Condition(self.lock)
+        self.queue = []
+        # Records submitted and records written so far.
+        self.submitted = 0
+        self.written = 0
+        self.closed = False
+        # Set while written data waits for its fsync (fsync-interval).
+        self.dirty = False
+        self.synced = 0.0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    # Private methods
+
+    def _run(self):
+        while True:
+            self.cond.acquire()
+            try:
+                while not self.queue and not self.closed:
+                    if not self.dirty:
+                        self.cond.wait()
+                    elif not self.cond.wait(self.interval):
+                        break
+                batch = self.queue
+                self.queue = []
+                closed = self.closed
+            finally:
+                self.cond.release()
+
+            if batch:
+                self._commit(batch)
+                self.cond.acquire()
+                try:
+                    self.written = self.written + len(batch)
+                    self.written_cond.notify_all()
+                finally:
+                    self.cond.release()
+            elif self.dirty:
+                # A whole interval went by without a new batch.
+                try:
+                    self._fsync()
+                except OSError:
+                    pass
+            if closed:
+                break
+
+    def _commit(self, batch):
+        error = None
+        try:
+            start = self.file.tell()
+            self.file.write(b"".join(record for record, item, t in batch))
+            self.file.flush()
+            if self.durability == FSYNC_BATCH:
+                os.fsync(self.file.fileno())
+            elif self.durability == FSYNC_INTERVAL:
+                self.dirty = True
+                if time.time() - self.synced >= self.interval:
+                    self._fsync()
+            if self.on_write is not None:
+                ends = []
+                for record, item, ticket in batch:
+                    start = start + len(record)
+                    ends.append(start)
+                self.on_write([item for record, item, t in batch], ends)
+        except Exception as e:
+            error = e
+        for record, item, ticket in batch:
+            if ticket is not None:
+                ticket.done(error)
+
+    def _fsync(self):
+        self.dirty = False
+        self.synced = time.time()
+        os.fsync(self.file.fileno())
+
+    # Public methods
+
+    def submit(self, record, item=None):
+        """Queue record (bytes) to be appended to the file.
+
+        Return the Ticket to wait on.
+
+        """
+
+        ticket = Ticket()
+        if self.durability == NONE:
+            ticket.done()
+            queued = (record, item, None)
+        else:
+            queued = (record, item, ticket)
+
+        self.cond.acquire()
+        try:
+            if self.closed:
+                raise ValueError("The file is closed")
+            self.queue.append(queued)
+            self.submitted = self.submitted + 1
+            self.cond.notify()
+        finally:
+            self.cond.release()
+        return ticket
+
+    def flush(self):
+        """Wait until the records submitted so far are written."""
+
+        self.cond.acquire()
+        try:
+            submitted = self.submitted
+            self.written_cond.wait_for(
+                lambda: self.written >= submitted or self.closed)
+        finally:
+            self.cond.release()
+
+    def rotate(self, file_name):
+        """Append to file_name from now on.
+
+        Only call from on_write, between two batches.
+
+        """
+
+        if self.dirty:
+            self._fsync()
+        self.file.close()
+        self.file = open(file_name, "ab")
+
+    def close(self):
+        """Write what is queued, sync it and close the file."""
+
+        self.cond.acquire()
+        try:
+            if self.closed:
+                return
+            self.closed = True
+            self.cond.notify()
+            self.written_cond.notify_all()
+        finally:
+            self.cond.release()
+        self.thread.join()
+        if self.durability != NONE and self.durability != FLUSH:
+            os.fsync(self.file.fileno())
+        self.file.close()
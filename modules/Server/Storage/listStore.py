@@ -0,0 +1,44 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Modified: 16 October 2026
+#
+# Copyright 2012-2015 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Storage engine keeping the fortunes in a list of strings."""
+
+import sys
+from . import store
+from . import groupCommit
+
+
+class ListStore(store.Store):
+
+    """One str object per fortune.
+
+    Simple and fast, but every fortune costs an object header on top of
+    its text, plus a slot in the list.
+
+    """
+
+    def __init__(self, db_file, durability=groupCommit.FLUSH):
+        self.fortunes = []
+        store.Store.__init__(self, db_file, durability)
+
+    # Private methods
+
+    def _add(self, fortune):
+        self.fortunes.append(fortune)
+
+    # Public methods
+
+    def __len__(self):
+        return len(self.fortunes)
+
+    def get(self, index):
+        return self.fortunes[index]
+
+    def memory_usage(self):
+        return sys.getsizeof(self.fortunes) + sum(
+            sys.getsizeof(fortune) for fortune in self.fortunes)
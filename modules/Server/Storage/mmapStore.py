@@ -0,0 +1,89 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Modified: 16 October 2026
+#
+# Copyright 2012-2015 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Storage engine reading the fortunes straight from the mapped file."""
+
+import os
+import sys
+import mmap
+import threading
+from . import store
+from . import groupCommit
+from . import offsetIndex
+
+
+class MmapStore(store.Store):
+
+    """The fortune file, memory-mapped, and its offset index.
+
+    See offsetIndex for the layout of the index. Only the index (8 bytes
+    per fortune) lives in memory, the text is paged in by the kernel as
+    it is read, so files larger than the memory can be served.
+
+    Fortunes are read as they are in the file, with the newline that
+    ends their last line.
+
+    Appended fortunes go to the end of the file. The mapping is only
+    extended (remapped) when a fortune past its end is read.
+
+    """
+
+    def __init__(self, db_file, durability=groupCommit.FLUSH):
+        self.map = None
+        self.offsets = None
+        self.remap_lock = threading.Lock()
+        store.Store.__init__(self, db_file, durability)
+
+    # Private methods
+
+    def _remap(self, size):
+        """Make sure the first size bytes of the file are mapped."""
+
+        self.remap_lock.acquire()
+        try:
+            if self.map is not None and len(self.map) >= size:
+                return self.map
+            with open(self.db_file, "rb") as f:
+                length = os.fstat(f.fileno()).st_size
+                if length == 0:
+                    return None
+                # Readers may still slice the old mapping, it is closed
+                # once nobody refers to it any more.
+                self.map = mmap.mmap(f.fileno(), length,
+                                     access=mmap.ACCESS_READ)
+            return self.map
+        finally:
+            self.remap_lock.release()
+
+    def _written(self, fortunes, ends):
+        # Text left after the last '%' line becomes part of the first
+        # fortune, as it does when the file is read again.
+        self.offsets.extend(ends)
+
+    # Public methods
+
+    def load(self):
+        # The file is only mapped when the first fortune is read.
+        self.offsets = offsetIndex.build(self.db_file)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def get(self, index):
+        start = self.offsets[index]
+        end = self.offsets[index + 1] - 2
+        data = self.map
+        if data is None or len(data) < end:
+            data = self._remap(end)
+        return data[start:end].decode()
+
+    def extent(self, count):
+        return self.offsets[count]
+
+    def memory_usage(self):
+        return sys.getsizeof(self.offsets)
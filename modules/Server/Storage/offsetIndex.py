@@ -0,0 +1,160 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Modified: 16 October 2026
+#
+# Copyright 2012-2015 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Offset index of a fortune file, persisted next to it.
+
+The index of db_file is an array('Q') of the offsets where its fortunes
+start, followed by the offset where the next fortune will start: fortune
+i spans offsets[i] up to the '%' line before offsets[i + 1], so the
+offsets also give the lengths.
+
+build() saves the index in db_file + ".idx", along with the size and
+modification time of the file it was built from, a checksum of the last
+bytes it covers and a checksum of the offsets. On the next start:
+    --  if the file did not change, the index is used as it is, without
+        reading the file at all,
+    --  if the file only grew (fortunes are appended), the index is used
+        and only the new tail of the file is scanned,
+    --  otherwise (or if the sidecar is damaged) the whole file is
+        scanned again.
+
+Fortune files are only ever appended to: a file edited in place, away
+from the end of its indexed part, is not noticed. Remove the sidecar
+after editing a file by hand.
+
+"""
+
+import os
+import mmap
+import zlib
+import struct
+from array import array
+
+SEPARATOR = b"\n%\n"
+MAGIC = b"FIDX\x01"
+
+# magic, count, indexed bytes, file size, file mtime (ns), checksum of
+# the last indexed bytes, checksum of the offsets.
+_header = struct.Struct(">5sQQQQII")
+
+# How many indexed bytes are checked when the file has grown.
+TAIL_CHECK = 4096
+
+
+def path(db_file):
+    return db_file + ".idx"
+
+
+def scan(data, start, offsets):
+    """Add to offsets the fortunes of data from offset start on.
+
+    start must be where a fortune starts. Return the offset where the
+    first incomplete fortune starts.
+
+    """
+
+    while True:
+        if data[start:start + 2] == b"%\n":
+            # An empty fortune.
+            start = start + 2
+            offsets.append(start)
+            continue
+        pos = data.find(SEPARATOR, start)
+        if pos < 0:
+            break
+        start = pos + len(SEPARATOR)
+        offsets.append(start)
+    return start
+
+
+def _tail_checksum(f, end):
+    begin = max(0, end - TAIL_CHECK)
+    f.seek(begin)
+    return zlib.crc32(f.read(end - begin))
+
+
+def load(db_file):
+    """Return the saved offsets that are still valid for db_file.
+
+    Return None if there is no usable index. The file may hold more
+    fortunes after the last offset.
+
+    """
+
+    try:
+        with open(path(db_file), "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < _header.size:
+        return None
+    magic, count, end, size, mtime, tail, checksum = \
+        _header.unpack_from(data)
+    body = data[_header.size:]
+    if magic != MAGIC or len(body) != 8 * (count + 1) or \
+            zlib.crc32(body) != checksum:
+        return None
+    offsets = array('Q')
+    offsets.frombytes(body)
+    if offsets[-1] != end:
+        return None
+
+    with open(db_file, "rb") as f:
+        st = os.fstat(f.fileno())
+        if st.st_size == size and st.st_mtime_ns == mtime:
+            return offsets
+        if st.st_size < end or _tail_checksum(f, end) != tail:
+            return None
+    return offsets
+
+
+def save(db_file, offsets):
+    """Write the index of db_file; failures only cost a rescan later."""
+
+    end = offsets[-1]
+    body = offsets.tobytes()
+    try:
+        with open(db_file, "rb") as f:
+            st = os.fstat(f.fileno())
+            tail = _tail_checksum(f, end)
+        tmp = path(db_file) + ".tmp"
+        with open(tmp, "wb") as out:
+            out.write(_header.pack(MAGIC, len(offsets) - 1, end, st.st_size,
+                                   st.st_mtime_ns, tail, zlib.crc32(body)))
+            out.write(body)
+        os.replace(tmp, path(db_file))
+    except OSError:
+        pass
+
+
+def build(db_file):
+    """Return the offsets of the fortunes of db_file.
+
+    Reuse the saved index, scan what it does not cover and save the
+    index again if that added fortunes.
+
+    """
+
+    offsets = load(db_file)
+    saved = offsets is not None
+    if not saved:
+        offsets = array('Q', [0])
+    count = len(offsets)
+
+    with open(db_file, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size > offsets[-1]:
+            data = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            try:
+                scan(data, offsets[-1], offsets)
+            finally:
+                data.close()
+
+    if not saved or len(offsets) != count:
+        save(db_file, offsets)
+    return offsets
@@ -0,0 +1,331 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Modified: 16 October 2026
+#
+# Copyright 2012-2015 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Storage engine splitting the fortunes over a log of segments.
+
+The fortunes of db_file live in the directory db_file + ".d":
+    --  segment files, in the fortune file format, that are never
+        modified once they are sealed,
+    --  the active segment, the last one, which new fortunes are
+        appended to until it reaches segment_size, or has been active
+        for seal_interval seconds, and is sealed,
+    --  MANIFEST, the list of the segments in order, replaced
+        atomically whenever a segment is added or compacted away.
+
+The first time a file is opened with this engine, it is copied into the
+directory as its first segment; db_file itself is not used after that.
+
+Every segment is memory-mapped and has its own offset index (see
+mmapStore and offsetIndex); the segments are loaded in parallel.
+
+Sealing on age keeps the active segment, which snapshot() copies, small
+when writes are rare, and leaves small sealed segments behind. A
+background compactor merges runs of small sealed segments into one,
+keeping every fortune in place: the index of a fortune never changes,
+so readers may take the length once and get() any index below it, and
+replicas agree on indexes whatever their segments. snapshot()
+copies the database to another directory, hard-linking the sealed
+segments, so it costs about the size of the active segment.
+
+"""
+
+import os
+import json
+import time
+import bisect
+import shutil
+import threading
+import concurrent.futures
+from . import store
+from . import groupCommit
+from .mmapStore import MmapStore
+
+MANIFEST = "MANIFEST"
+
+
+class SegmentedStore(store.Store):
+
+    """Fortunes kept in a directory of memory-mapped segments.
+
+    Public methods (besides those of Store):
+        --  compact()
+        --  snapshot(directory)
+
+    """
+
+    def __init__(self, db_file, durability=groupCommit.FLUSH,
+                 segment_size=64 * 2 ** 20, compact_interval=60.0,
+                 seal_interval=10.0):
+        self.segment_size = segment_size
+        self.seal_interval = seal_interval
+        # When the active segment took its first fortune, None while it
+        # is empty.
+        self.active_since = None
+        self.directory = db_file + ".d"
+        # Serializes the changes to the list of segments.
+        self.lock = threading.Lock()
+        # Only one compaction at a time.
+        self.compact_lock = threading.Lock()
+        self.stopped = threading.Event()
+        # Opened read-only: the committer appends to the active segment.
+        store.Store.__init__(self, db_file, None)
+
+        self.committer = groupCommit.GroupCommit(
+            self._path(self.names[-1]), durability, self._written)
+        self.compactor = threading.Thread(
+            target=self._compact_loop, args=(compact_interval,), daemon=True)
+        self.compactor.start()
+
+    # Private methods
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _new_name(self):
+        name = "{:08d}.seg".format(self.next)
+        self.next = self.next + 1
+        return name
+
+    def _open(self, name):
+        segment = MmapStore(self._path(name), None)
+        # Map the segment right away: once compacted away its file is
+        # gone, but mappings stay valid.
+        segment._remap(0)
+        return segment
+
+    def _publish(self, names, segments):
+        """Install a new list of segments; call with lock held."""
+
+        manifest = {
+            "next": self.next,
+            "segments": names
+        }
+        tmp = self._path(MANIFEST + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path(MANIFEST))
+
+        starts = [0]
+        for segment in segments[:-1]:
+            starts.append(starts[-1] + len(segment))
+        self.names = names
+        # Readers take the segments and their first indexes in one go.
+        self.view = (segments, starts)
+
+    def _written(self, fortunes, ends):
+        segments, starts = self.view
+        active = segments[-1]
+        active._written(fortunes, ends)
+        now = time.time()
+        if self.active_since is None:
+            self.active_since = now
+        if (ends[-1] < self.segment_size and
+                now - self.active_since < self.seal_interval):
+            return
+
+        # Seal the active segment and start a new one.
+        self.lock.acquire()
+        try:
+            name = self._new_name()
+            open(self._path(name), "ab").close()
+            self.committer.rotate(self._path(name))
+            segments, starts = self.view
+            self._publish(self.names + [name],
+                          segments + [self._open(name)])
+            self.active_since = None
+        finally:
+            self.lock.release()
+
+    def _compact_loop(self, interval):
+        while not self.stopped.wait(interval):
+            try:
+                self.compact()
+            except Exception as e:
+                print("Compaction failed: {}".format(e))
+
+    def _plan(self, names, segments):
+        """Return the runs of sealed segments worth compacting."""
+
+        runs = []
+        run = []
+        size = 0
+        for name, segment in zip(names[:-1], segments[:-1]):
+            length = segment.offsets[-1]
+            if run and size + length > self.segment_size:
+                runs.append(run)
+                run = []
+                size = 0
+            run.append(name)
+            size = size + length
+        if run:
+            runs.append(run)
+        # A run of one segment would be copied as it is.
+        return [run for run in runs if len(run) > 1]
+
+    def _merge(self, run, segments):
+        """Write the fortunes of the run into a new segment, in order.
+
+        Return its name and the number of fortunes written to it.
+
+        """
+
+        written = 0
+        self.lock.acquire()
+        try:
+            name = self._new_name()
+        finally:
+            self.lock.release()
+        path = self._path(name)
+        with open(path + ".tmp", "wb") as out:
+            for segment in segments:
+                offsets = segment.offsets
+                if len(offsets) == 1:
+                    continue
+                # The mapping made by _open misses what was appended to
+                # the segment while it was active.
+                data = segment._remap(offsets[-1])
+                out.write(data[:offsets[-1]])
+                written = written + len(offsets) - 1
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(path + ".tmp", path)
+        return name, written
+
+    # Public methods
+
+    def load(self):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        try:
+            with open(self._path(MANIFEST), "r") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {"next": 2, "segments": ["00000001.seg"]}
+            first = self._path(manifest["segments"][0])
+            if os.path.exists(self.db_file):
+                shutil.copyfile(self.db_file, first)
+            else:
+                open(first, "ab").close()
+
+        self.next = manifest["next"]
+        names = manifest["segments"]
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(8, len(names))) as executor:
+            segments = list(executor.map(self._open, names))
+
+        self.lock.acquire()
+        try:
+            self._publish(names, segments)
+        finally:
+            self.lock.release()
+
+        # Forget the files left over by an interrupted compaction.
+        for file in os.listdir(self.directory):
+            if file.endswith(".seg") and file not in names:
+                os.remove(self._path(file))
+                if os.path.exists(self._path(file) + ".idx"):
+                    os.remove(self._path(file) + ".idx")
+
+    def __len__(self):
+        segments, starts = self.view
+        return starts[-1] + len(segments[-1])
+
+    def get(self, index):
+        segments, starts = self.view
+        i = bisect.bisect_right(starts, index) - 1
+        return segments[i].get(index - starts[i])
+
+    def extent(self, count):
+        # The fortunes are in the segments, not in db_file.
+        return None
+
+    def memory_usage(self):
+        segments, starts = self.view
+        return sum(segment.memory_usage() for segment in segments)
+
+    def compact(self):
+        """Merge the runs of small sealed segments.
+
+        Return the number of segments removed.
+
+        """
+
+        self.compact_lock.acquire()
+        try:
+            segments, starts = self.view
+            names = self.names
+            by_name = dict(zip(names, segments))
+            removed = 0
+            for run in self._plan(names, segments):
+                merged, expected = self._merge(run,
+                                               [by_name[n] for n in run])
+                segment = self._open(merged)
+                if len(segment) != expected:
+                    raise Exception(
+                        "Merged {} fortunes into {} instead of {}".format(
+                            len(segment), merged, expected))
+
+                # Sealed segments only change here, so the run is still
+                # where it was; only new segments may have been added.
+                self.lock.acquire()
+                try:
+                    names = list(self.names)
+                    segments = list(self.view[0])
+                    i = names.index(run[0])
+                    names[i:i + len(run)] = [merged]
+                    segments[i:i + len(run)] = [segment]
+                    self._publish(names, segments)
+                finally:
+                    self.lock.release()
+
+                for name in run:
+                    os.remove(self._path(name))
+                    if os.path.exists(self._path(name) + ".idx"):
+                        os.remove(self._path(name) + ".idx")
+                removed = removed + len(run) - 1
+            return removed
+        finally:
+            self.compact_lock.release()
+
+    def snapshot(self, directory):
+        """Copy the database to directory, as a SegmentedStore directory.
+
+        The sealed segments are hard-linked, the active one is copied up
+        to its last written fortune.
+
+        """
+
+        os.makedirs(directory)
+        self.compact_lock.acquire()
+        self.lock.acquire()
+        try:
+            segments, starts = self.view
+            names = list(self.names)
+            manifest = {
+                "next": self.next,
+                "segments": names
+            }
+            end = segments[-1].offsets[-1]
+            for name in names[:-1]:
+                os.link(self._path(name), os.path.join(directory, name))
+        finally:
+            self.lock.release()
+            self.compact_lock.release()
+
+        with open(self._path(names[-1]), "rb") as f:
+            data = f.read(end)
+        with open(os.path.join(directory, names[-1]), "wb") as out:
+            out.write(data)
+        with open(os.path.join(directory, MANIFEST), "w") as out:
+            json.dump(manifest, out)
+
+    def close(self):
+        self.stopped.set()
+        store.Store.close(self)
@@ -0,0 +1,127 @@
+# -----------------------------------------------------------------------------
+# Distributed Systems (TDDD25)
+# -----------------------------------------------------------------------------
+# Modified: 16 October 2026
+#
+# Copyright 2012-2015 Linkoping University
+# -----------------------------------------------------------------------------
+
+"""Base class of the storage engines behind Database.
+
+A fortune file holds the fortunes one after the other, each followed by
+a line with a single '%'. An engine keeps the fortunes of one such file
+and appends the new ones to it.
+
+"""
+
+from . import offsetIndex
+from . import groupCommit
+
+
+class Store(object):
+
+    """Fortunes of a fortune file, kept by some storage engine.
+
+    Subclasses implement:
+        --  _add(fortune)  :: keep one more fortune in memory,
+        --  __len__()
+        --  get(index)
+        --  memory_usage()
+
+    Public methods:
+        --  __init__(db_file, durability)
+        --  append(fortune)
+        --  flush()
+        --  extent(count)
+        --  close()
+
+    New fortunes are appended to the file by a group committer, see
+    groupCommit; they can be read once they are written. A store opened
+    with durability None is read-only.
+
+    Fortunes are only ever appended, and an engine makes a new fortune
+    readable before __len__ counts it. A count read once is thus a
+    consistent snapshot of the store: readers need no lock, whatever
+    the writers do meanwhile.
+
+    """
+
+    def __init__(self, db_file, durability=groupCommit.FLUSH):
+        self.db_file = db_file
+        self.load()
+        self.committer = None
+        if durability is not None:
+            self.committer = groupCommit.GroupCommit(db_file, durability,
+                                                     self._written)
+
+    # Private methods
+
+    def _add(self, fortune):
+        raise NotImplementedError
+
+    def _written(self, fortunes, ends):
+        """Called by the committer once fortunes are in the file."""
+
+        # As read back from the file, with the newline before the '%'.
+        for fortune in fortunes:
+            self._add(fortune + "\n")
+
+    # Public methods
+
+    def load(self):
+        """Read all the fortunes of the file.
+
+        The fortunes are cut out of the file with its offset index, see
+        offsetIndex. Text after the last '%' line is not a complete
+        fortune yet and is left out.
+
+        """
+
+        offsets = offsetIndex.build(self.db_file)
+        with open(self.db_file, "rb") as f:
+            data = f.read(offsets[-1])
+        for i in range(len(offsets) - 1):
+            self._add(data[offsets[i]:offsets[i + 1] - 2].decode())
+
+    def append(self, fortune):
+        """Add a fortune at the end of the file.
+
+        Return the groupCommit.Ticket to wait on.
+
+        """
+
+        return self.committer.submit(
+            fortune.encode() + offsetIndex.SEPARATOR, fortune)
+
+    def flush(self):
+        """Wait until the fortunes appended so far are written."""
+
+        if self.committer is not None:
+            self.committer.flush()
+
+    def extent(self, count):
+        """Return the length of the part of the file holding the first
+        count fortunes, None if the file does not hold them as they are.
+
+        Every fortune read back ends with the newline before its '%'
+        line, so it takes two more bytes in the file.
+
+        """
+
+        return sum(len(self.get(i).encode()) + 2 for i in range(count))
+
+    def close(self):
+        if self.committer is not None:
+            self.committer.close()
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def get(self, index):
+        raise NotImplementedError
+
+    def memory_usage(self):
+        """Return the number of bytes used to keep the fortunes."""
+
+        raise NotImplementedError
+
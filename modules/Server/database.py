@@ -10,64 +10,104 @@
 """Implementation of a simple database class."""
 
 import random
+from .Storage.listStore import ListStore
+from .Storage.compactStore import CompactStore
+from .Storage.mmapStore import MmapStore
+from .Storage.segmentedStore import SegmentedStore
+from .Storage import groupCommit
+
+# The storage engines, by name.
+engines = {
+    "list": ListStore,
+    "compact": CompactStore,
+    "mmap": MmapStore,
+    "segmented": SegmentedStore
+}
 
 
 class Database(object):
 
-    """Class containing a database implementation."""
+    """Class containing a database implementation.
 
-    def __init__(self, db_file):
-        self.db_file = db_file
+    The fortunes are kept by one of the storage engines, see engines.
+    durability is one of groupCommit.levels and says when a write is
+    done, see groupCommit.
+
+    read() takes no lock and may run alongside writes: it picks among
+    the fortunes published when it starts (see Storage.store.Store).
+
+    """
+
+    def __init__(self, db_file, engine="list", durability=groupCommit.FLUSH):
         self.rand = random.Random()
         self.rand.seed()
 
         # keep the db name
         self.db_file = db_file
 
-        # array containing fortunes
-        self.fortunes = []
-
-        # read fortunes into the array 
-
-        file = open(self.db_file, 'r')
-        i = 0
-        msg = ''
-        for line in file:
-            if line == '%\n':
-                self.fortunes.insert(i, msg)
-                msg = ''
-                i = i + 1
-            else:
-                msg = msg + line
-
-        file.close()
-
-        pass
+        # read fortunes into the store
+        self.store = engines[engine](db_file, durability)
 
     def read(self):
         """Read a random location in the database."""
 
-        if len(self.fortunes) == 0:
+        # The fortunes published so far, later ones are not looked at.
+        count = len(self.store)
+        if count == 0:
             print ('no message in the database')
             return
 
         # select the random index to take
 
-        chosen = random.randint(0, len(self.fortunes) - 1)
+        chosen = self.rand.randint(0, count - 1)
 
-        return self.fortunes[chosen]
-
-        pass
+        return self.store.get(chosen)
 
     def write(self, fortune):
         """Write a new fortune to the database."""
 
-        # write the new fortune into the db file
-        with open(self.db_file, "a") as out:
-            out.write(fortune)
-            out.write('\n%\n')
+        self.submit(fortune).wait()
+
+    def submit(self, fortune):
+        """Start writing a new fortune to the database.
+
+        Return the groupCommit.Ticket to wait on. Writers holding a lock
+        should release it before waiting, so that the writes of several
+        writers go to disk together.
+
+        """
+
+        # write the new fortune into the db file and the store
+        return self.store.append(fortune)
+
+    def flush(self):
+        """Wait until the writes submitted so far are done."""
+
+        self.store.flush()
+
+    def __len__(self):
+        """Return the number of fortunes that can be read."""
+
+        return len(self.store)
+
+    def fortunes(self, start, end=None):
+        """Return the fortunes from index start up to end, as written."""
+
+        if end is None:
+            end = len(self.store)
+        # The store gives them back with the newline before the '%'.
+        return [self.store.get(i)[:-1] for i in range(start, end)]
+
+    def extent(self, count):
+        """Return the number of bytes of db_file holding the first count
+        fortunes, None if they are not kept there (see Storage.store)."""
+
+        return self.store.extent(count)
+
+    def close(self):
+        self.store.close()
 
-        # add it to the internal fortune array
-        self.fortunes.insert(len(self.fortunes), fortune)
+    def memory_usage(self):
+        """Return the number of fortunes and the bytes used to keep them."""
 
-        pass
+        return len(self.store), self.store.memory_usage()
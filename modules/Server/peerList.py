@@ -9,8 +9,39 @@
 
 """Package for handling a list of objects of the same type as a given one."""
 
-import threading
+import time
+import concurrent.futures
 from Common import orb
+from Common import lockStats
+
+# Values of broadcast's wait argument besides a number of replies.
+ALL = "all"
+NONE = 0
+
+
+class Response(object):
+
+    """Outcome of the call made to one peer by PeerList.broadcast.
+
+    done is False until the peer replied (or the call failed); then
+    either result or error is set, and latency holds the seconds the
+    call took. Calls still running when broadcast returns fill their
+    Response in later.
+
+    """
+
+    def __init__(self):
+        self.done = False
+        self.result = None
+        self.error = None
+        self.latency = None
+
+    def __repr__(self):
+        if not self.done:
+            return "<pending>"
+        if self.error is not None:
+            return "<error {!r} in {:.3f}s>".format(self.error, self.latency)
+        return "<{!r} in {:.3f}s>".format(self.result, self.latency)
 
 
 class PeerList(object):
@@ -19,7 +50,7 @@ class PeerList(object):
 
     def __init__(self, owner):
         self.owner = owner
-        self.lock = threading.Condition()
+        self.lock = lockStats.Condition("peer_list")
         self.peers = {}
 
     # Public methods
@@ -71,22 +102,69 @@ class PeerList(object):
 
         self.lock.acquire()
         try:
-            #
-            # Your code here.
-            #
+            # Peers that cannot be reached do not matter any more, and
+            # must not keep us from leaving.
+            self.broadcast("unregister_peer", self.owner.id, timeout=5.0)
+        finally:
+            self.lock.release()
 
-            pids = sorted(self.peers.keys())
-            for pid in pids:
-                try:
-                    if pid != self.owner.id:
-                        self.peers[pid].unregister_peer(self.owner.id)
-                except:
-                    pass
+    def broadcast(self, method, *args, timeout=None, wait=ALL):
+        """Call method with args on all the other peers at once.
+
+        wait says when to return:
+            --  ALL  :: once all the peers replied,
+            --  k    :: once k peers replied successfully (or all the
+                        calls are over),
+            --  NONE :: right away (fire-and-forget).
+        but never later than timeout seconds, if given.
+
+        Return a dictionary of Response objects by peer id.
+
+        """
 
-            pass
+        self.lock.acquire()
+        try:
+            targets = [(pid, stub.address) for pid, stub in self.peers.items()
+                       if pid != self.owner.id]
         finally:
             self.lock.release()
 
+        responses = {}
+        futures = {}
+        start = time.time()
+        for pid, address in targets:
+            response = responses[pid] = Response()
+
+            def done(f, response=response):
+                response.latency = time.time() - start
+                try:
+                    response.result = f.result()
+                except Exception as e:
+                    response.error = e
+                response.done = True
+
+            future = getattr(orb.FutureStub(address), method)(*args)
+            future.add_done_callback(done)
+            futures[future] = response
+
+        if wait == ALL:
+            concurrent.futures.wait(futures, timeout)
+        elif wait != NONE:
+            pending = set(futures)
+            succeeded = 0
+            while pending and succeeded < wait:
+                left = None
+                if timeout is not None:
+                    left = timeout - (time.time() - start)
+                    if left <= 0:
+                        break
+                finished, pending = concurrent.futures.wait(
+                    pending, left, concurrent.futures.FIRST_COMPLETED)
+                succeeded = succeeded + len(
+                    [f for f in finished if f.exception() is None])
+
+        return responses
+
     def register_peer(self, pid, paddr):
         """Register a new peer joining the network."""
 
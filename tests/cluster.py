@@ -0,0 +1,199 @@
+"""Peers of the lab5 servers, for the tests.
+
+make_peers() gives peers whose distributed locks call each other
+directly instead of over RMI, each call in a thread of its own as a
+Skeleton would.
+
+Each Replica has a Skeleton, a PeerList and a Database of its own, like
+the lab5 servers, served on localhost; the peer lists are filled in by
+connect() instead of the name service.
+
+QuietTest keeps the progress the servers print out of the test output.
+
+"""
+
+import os
+import sys
+import time
+import socket
+import tempfile
+import threading
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "modules"))
+from Common import orb
+from Common import lockStats
+from Server import database
+from Server.peerList import PeerList
+from Server.Lock.distributedLock import DistributedLock
+from Server.Lock.distributedReadWriteLock import DistributedReadWriteLock
+
+
+class QuietTest(unittest.TestCase):
+
+    def setUp(self):
+        self.stdout = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+
+    def tearDown(self):
+        sys.stdout.close()
+        sys.stdout = self.stdout
+
+
+class Owner(object):
+
+    def __init__(self, pid):
+        self.id = pid
+
+
+class LocalStub(object):
+
+    """Stands for the stub of another peer, calling its lock directly."""
+
+    def __init__(self, peer):
+        self.peer = peer
+
+    def request_token(self, time, pid):
+        return self.peer.lock.request_token(time, pid)
+
+    def obtain_token(self, token):
+        return self.peer.lock.obtain_token(token)
+
+
+class LocalPeerList(object):
+
+    """The part of PeerList DistributedLock uses."""
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.lock = lockStats.Condition("peer_list")
+        self.peers = {}
+
+    def broadcast(self, method, *args, timeout=None):
+        threads = []
+        for pid, stub in list(self.peers.items()):
+            if pid == self.owner.id:
+                continue
+            thread = threading.Thread(
+                target=self._call, args=(stub, method, args))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join(timeout)
+
+    def _call(self, stub, method, args):
+        # Let other calls in meanwhile, as the network would.
+        time.sleep(0.001)
+        getattr(stub, method)(*args)
+
+
+class LocalPeer(object):
+
+    def __init__(self, pid):
+        self.owner = Owner(pid)
+        self.peer_list = LocalPeerList(self.owner)
+        self.lock = DistributedLock(self.owner, self.peer_list)
+        self.drwlock = DistributedReadWriteLock(self.lock)
+
+
+def make_peers(count):
+    peers = [LocalPeer(pid) for pid in range(1, count + 1)]
+    for peer in peers:
+        for other in peers:
+            peer.peer_list.peers[other.owner.id] = LocalStub(other)
+    for peer in peers:
+        peer.lock.initialize()
+    return peers
+
+
+FORTUNES = ["first", "second", "third"]
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("", 0))
+        return s.getsockname()[1]
+
+
+class Replica(object):
+
+    type = "test_replica"
+
+    def __init__(self, pid, directory, engine="list"):
+        self.id = pid
+        self.db_file = os.path.join(directory, "fortune_{}.db".format(pid))
+        with open(self.db_file, "w") as f:
+            for fortune in FORTUNES:
+                f.write(fortune + "\n%\n")
+        self.db = database.Database(self.db_file, engine)
+        self.peer_list = PeerList(self)
+        self.drwlock = DistributedReadWriteLock(
+            DistributedLock(self, self.peer_list))
+        self.dispatched_calls = {}
+        self.urgent_calls = frozenset()
+
+        port = free_port()
+        self.address = (socket.gethostname(), port)
+        self.skeleton = orb.Skeleton(self, ("", port))
+
+    def serve(self, service, methods, urgent=True):
+        """Serve the given methods of service, as urgent calls unless
+        told otherwise."""
+
+        for method in methods:
+            self.dispatched_calls[method] = getattr(service, method)
+        if urgent:
+            self.urgent_calls = self.urgent_calls | frozenset(methods)
+
+    def start(self):
+        self.skeleton.urgent_calls = self.urgent_calls
+        self.skeleton.start()
+        # Wait until it listens.
+        deadline = time.time() + 5
+        while True:
+            try:
+                socket.create_connection(self.address, 1).close()
+                return
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.01)
+
+    def __getattr__(self, attr):
+        if attr in self.__dict__.get("dispatched_calls", {}):
+            return self.dispatched_calls[attr]
+        raise AttributeError(attr)
+
+    def fortunes(self):
+        """Return the fortunes of the database file, in order."""
+
+        with open(self.db_file) as f:
+            return f.read().split("\n%\n")[:-1]
+
+    def close(self):
+        self.db.close()
+
+
+def connect(replicas, others=None):
+    """Make the replicas know about each other, or only about others."""
+
+    for replica in replicas:
+        known = replicas if others is None else others
+        replica.peer_list.peers = {
+            other.id: orb.Stub(other.address)
+            for other in known + [replica]}
+
+
+class Cluster(object):
+
+    """A temporary directory holding the files of count replicas."""
+
+    def __init__(self, count, engine="list"):
+        self.directory = tempfile.TemporaryDirectory()
+        self.replicas = [Replica(pid, self.directory.name, engine)
+                         for pid in range(1, count + 1)]
+
+    def close(self):
+        for replica in self.replicas:
+            replica.close()
+        self.directory.cleanup()
@@ -0,0 +1,43 @@
+"""Tests of the wire codecs."""
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "modules"))
+from Common import codec
+
+
+MESSAGE = {
+    "method": "write",
+    "args": ["fortune\n", 1, -2 ** 70, 1.5, None, True, False, b"\x00\xff"],
+    "id": 42,
+    7: {"nested": []}
+}
+
+
+class BinaryCodecTest(unittest.TestCase):
+
+    def setUp(self):
+        self.codec = codec.by_name("binary")
+
+    def test_round_trip(self):
+        data = self.codec.encode(MESSAGE)
+        self.assertEqual(self.codec.decode(data), MESSAGE)
+
+    def test_truncated(self):
+        data = self.codec.encode(MESSAGE)
+        for n in range(len(data)):
+            with self.assertRaises(codec.CodecError):
+                self.codec.decode(data[:n])
+
+    def test_garbled(self):
+        for data in [b"X", b"s\xff\xff\xff\xff", b"s\x00\x00\x00\x01\xff",
+                     b"I\x00\x00\x00\x01z", b"l\x00\x00\x00\x02N",
+                     b"l\x00\x00\x00\x01" * 100000]:
+            with self.assertRaises(codec.CodecError):
+                self.codec.decode(data)
+
+
+if __name__ == "__main__":
+    unittest.main()
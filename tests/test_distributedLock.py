@@ -0,0 +1,83 @@
+"""Tests of the token based distributed lock, see cluster.make_peers."""
+
+import os
+import sys
+import time
+import threading
+import unittest
+
+sys.path.append(os.path.dirname(__file__))
+from cluster import QuietTest, make_peers
+
+
+class DistributedLockTest(QuietTest):
+
+    def test_first_peer_has_token(self):
+        peers = make_peers(3)
+        self.assertTrue(peers[0].lock.acquire(0))
+        self.assertFalse(peers[1].lock.acquire(0.1))
+        peers[0].lock.release()
+        # The request of peer 2 is served on release.
+        self.assertTrue(peers[1].lock.acquire(5))
+        peers[1].lock.release()
+
+    def test_concurrent_acquires(self):
+        peers = make_peers(3)
+        inside = [0]
+        errors = []
+        state_lock = threading.Lock()
+
+        def writer(peer):
+            for i in range(20):
+                if not peer.drwlock.token_acquire(10):
+                    errors.append("peer {} timed out".format(peer.owner.id))
+                    return
+                try:
+                    with state_lock:
+                        inside[0] = inside[0] + 1
+                        if inside[0] > 1:
+                            errors.append("two peers hold the token")
+                    time.sleep(0.0005)
+                    with state_lock:
+                        inside[0] = inside[0] - 1
+                finally:
+                    peer.drwlock.token_release()
+
+        threads = [threading.Thread(target=writer, args=(peer,))
+                   for peer in peers for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+
+    def test_acquire_times_out(self):
+        peers = make_peers(2)
+        self.assertTrue(peers[0].lock.acquire())
+        start = time.time()
+        self.assertFalse(peers[1].lock.acquire(0.2))
+        self.assertGreaterEqual(time.time() - start, 0.2)
+        # The token comes once released, and a later acquire takes it
+        # without asking again.
+        peers[0].lock.release()
+        self.assertTrue(peers[1].lock.acquire(5))
+        peers[1].lock.release()
+
+    def test_token_after_timeout(self):
+        peers = make_peers(3)
+        self.assertTrue(peers[0].lock.acquire(5))
+        # Both ask, and give up.
+        self.assertFalse(peers[1].lock.acquire(0.2))
+        self.assertFalse(peers[2].lock.acquire(0.2))
+        # The token goes to peer 2, which no longer needs it, and must
+        # go on to peer 3, which asked.
+        peers[0].lock.release()
+        self.assertTrue(peers[2].lock.acquire(2))
+        peers[2].lock.release()
+        self.assertTrue(peers[1].lock.acquire(2))
+        peers[1].lock.release()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""Tests of the distributed readers-writers lock."""
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(__file__))
+from cluster import QuietTest, make_peers
+
+
+class DistributedReadWriteLockTest(QuietTest):
+
+    def test_token_leaves_readers_alone(self):
+        peers = make_peers(2)
+        drwlock = peers[0].drwlock
+        self.assertTrue(drwlock.token_acquire(5))
+        try:
+            # Replicating while holding the token does not keep the
+            # local readers out.
+            self.assertTrue(drwlock.try_read_acquire(1))
+            drwlock.read_release()
+
+            # Handing the fortune to the database does.
+            drwlock.write_acquire_local()
+            try:
+                self.assertFalse(drwlock.try_read_acquire(0.1))
+            finally:
+                drwlock.write_release_local()
+            self.assertTrue(drwlock.try_read_acquire(1))
+            drwlock.read_release()
+        finally:
+            drwlock.token_release()
+
+    def test_token_serializes_writers(self):
+        peers = make_peers(2)
+        self.assertTrue(peers[0].drwlock.token_acquire(5))
+        # Neither another thread of the same peer nor another peer gets
+        # the token meanwhile.
+        self.assertFalse(peers[0].drwlock.token_acquire(0.1))
+        self.assertFalse(peers[1].drwlock.token_acquire(0.1))
+        peers[0].drwlock.token_release()
+        self.assertTrue(peers[1].drwlock.token_acquire(5))
+        peers[1].drwlock.token_release()
+
+    def test_write_acquire_takes_both(self):
+        peers = make_peers(2)
+        drwlock = peers[0].drwlock
+        self.assertTrue(drwlock.write_acquire(5))
+        self.assertFalse(drwlock.try_read_acquire(0.1))
+        self.assertFalse(peers[1].drwlock.token_acquire(0.1))
+        drwlock.write_release()
+        self.assertTrue(drwlock.try_read_acquire(1))
+        drwlock.read_release()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,214 @@
+"""Tests of the calls made by orb.Stub, against a scripted server."""
+
+import os
+import sys
+import json
+import time
+import socket
+import threading
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "modules"))
+from Common import orb
+from Common import codec as wire
+from Common import tracing
+
+
+class DroppingServer(threading.Thread):
+
+    """Answers the first request of a connection and drops it after
+    reading the second one, as a server going away would."""
+
+    def __init__(self):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(5)
+        self.listener.settimeout(1.0)
+        self.address = self.listener.getsockname()
+        self.received = []
+
+    def run(self):
+        while True:
+            try:
+                conn, addr = self.listener.accept()
+            except socket.timeout:
+                break
+            try:
+                codec = wire.server_handshake(conn)
+                reader = wire.FrameReader(conn)
+                req = codec.decode(reader.read_frame())
+                self.received.append(req['args'])
+                conn.sendall(wire.frame(
+                    codec, {"result": "ok", "id": req['id']}))
+                req = codec.decode(reader.read_frame())
+                self.received.append(req['args'])
+            finally:
+                conn.close()
+        self.listener.close()
+
+
+class OneShotServer(threading.Thread):
+
+    """Speaks newline-delimited JSON and hangs up after each request, as
+    the older servers do."""
+
+    def __init__(self):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(64)
+        self.address = self.listener.getsockname()
+        self.count = 0
+
+    def run(self):
+        while True:
+            conn, addr = self.listener.accept()
+            with conn, conn.makefile("rwb") as f:
+                line = f.readline()
+                if line.startswith(wire.MAGIC):
+                    rep = {"error": {"name": "ValueError",
+                                     "args": ["Malformed request"]}}
+                else:
+                    self.count = self.count + 1
+                    rep = {"result": self.count}
+                f.write((json.dumps(rep) + "\n").encode())
+
+
+class StubTest(unittest.TestCase):
+
+    def test_server_hanging_up(self):
+        server = OneShotServer()
+        server.start()
+        stub = orb.Stub(server.address)
+        for i in range(300):
+            self.assertEqual(stub.check(), i + 1)
+
+    def test_call_is_not_sent_twice(self):
+        server = DroppingServer()
+        server.start()
+        stub = orb.Stub(server.address)
+
+        self.assertEqual(stub.write("first"), "ok")
+        # The server may have run the call before hanging up, so it is
+        # not made again.
+        with self.assertRaises(orb.ComunicationError):
+            stub.write("second")
+
+        server.join()
+        self.assertEqual(server.received, [["first"], ["second"]])
+
+
+class Echo(object):
+
+    def echo(self, value):
+        return value
+
+
+class ProcessRequestTest(unittest.TestCase):
+
+    def test_batch(self):
+        rep = orb.process_request(Echo(), {"batch": [
+            {"method": "echo", "args": [1]},
+            {"method": "missing", "args": []}]})
+        self.assertEqual(rep["result"][0], {"result": 1})
+        self.assertEqual(rep["result"][1]["error"]["name"],
+                         "AttributeError")
+
+    def test_malformed(self):
+        for req in [{"batch": 5}, {"batch": [5]}, {"batch": [[]]},
+                    {"method": "echo"}, {"method": "echo", "args": 5},
+                    {"args": []}]:
+            rep = orb.process_request(Echo(), req)
+            self.assertIn("error", rep)
+
+    def test_malformed_trace(self):
+        for trace in [5, [], ["a"], [1, 2], "trace", None]:
+            rep = orb.process_request(
+                Echo(), {"method": "echo", "args": [1], "trace": trace})
+            self.assertEqual(rep, {"result": 1})
+            self.assertIsNone(tracing.current())
+
+    def test_decode_request(self):
+        self.assertEqual(orb.decode_request(None, '{"method": "m"}'),
+                         {"method": "m"})
+        for data in ["5", "[]", "nonsense"]:
+            with self.assertRaises(ValueError):
+                orb.decode_request(None, data)
+        binary = wire.by_name("binary")
+        with self.assertRaises(ValueError):
+            orb.decode_request(binary, binary.encode([1, 2]))
+
+
+class Blocking(object):
+
+    urgent_calls = frozenset(["check"])
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def block(self):
+        self.release.wait(10)
+        return "done"
+
+    def check(self):
+        return "ok"
+
+
+class SkeletonTest(unittest.TestCase):
+
+    def serve(self, engine):
+        """Start a skeleton with a single worker and no queue to spare."""
+
+        owner = Blocking()
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.bind(("", 0))
+            port = s.getsockname()[1]
+        skeleton = engine(owner, ("", port), workers=1, queue_size=1,
+                          per_client=1, urgent_workers=1)
+        skeleton.start()
+        deadline = time.time() + 5
+        while True:
+            try:
+                conn = socket.create_connection((socket.gethostname(), port))
+                break
+            except socket.error:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.01)
+        self.addCleanup(conn.close)
+        self.addCleanup(owner.release.set)
+        return owner, conn, conn.makefile("rwb")
+
+    def call(self, f, method, cid):
+        f.write((json.dumps(
+            {"method": method, "args": [], "id": cid}) + "\n").encode())
+        f.flush()
+
+    def admission(self, engine):
+        owner, conn, f = self.serve(engine)
+        self.call(f, "block", 1)
+        self.call(f, "block", 2)
+        self.call(f, "check", 3)
+        busy, urgent = sorted([json.loads(f.readline()) for i in range(2)],
+                              key=lambda rep: rep["id"])
+        # The client already has a call running, the urgent call does
+        # not wait for it.
+        self.assertEqual(busy["error"]["name"], "ServerBusyError")
+        self.assertEqual(urgent, {"result": "ok", "id": 3})
+        owner.release.set()
+        self.assertEqual(json.loads(f.readline()),
+                         {"result": "done", "id": 1})
+        f.close()
+
+    def test_admission(self):
+        self.admission(orb.Skeleton)
+
+    def test_async_admission(self):
+        self.admission(orb.AsyncSkeleton)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""Tests of the primary-backup replication, on localhost replicas."""
+
+import os
+import sys
+import threading
+import unittest
+
+sys.path.append(os.path.dirname(__file__))
+from cluster import QuietTest, Cluster, FORTUNES, connect
+from Server.Replication.primaryReplication import PrimaryReplication
+
+# As in lab5, the writes forwarded to the primary queue like the others.
+METHODS = ["apply_update", "sequence_number"]
+
+
+class PrimaryReplicationTest(QuietTest):
+
+    def setUp(self):
+        QuietTest.setUp(self)
+        self.cluster = Cluster(3)
+        self.replicas = self.cluster.replicas
+        for replica in self.replicas:
+            replica.sequencer = PrimaryReplication(
+                replica, replica.peer_list, replica.db, replica.drwlock,
+                timeout=2.0)
+            replica.serve(replica.sequencer, METHODS)
+            replica.serve(replica.sequencer, ["sequence"], urgent=False)
+            replica.start()
+        connect(self.replicas)
+        for replica in self.replicas:
+            replica.sequencer.initialize()
+
+    def tearDown(self):
+        self.cluster.close()
+        QuietTest.tearDown(self)
+
+    def test_same_order_everywhere(self):
+        errors = []
+
+        def writer(replica, n):
+            try:
+                for i in range(5):
+                    replica.sequencer.write(
+                        "fortune {} of {}".format(i, n))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=writer, args=(replica, n))
+                   for n, replica in enumerate(self.replicas * 2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        primary = self.replicas[0]
+        self.assertEqual(primary.sequencer.primary(), 1)
+        self.assertEqual(primary.sequencer.sequence_number(), 30)
+        fortunes = primary.fortunes()
+        self.assertEqual(len(fortunes), len(FORTUNES) + 30)
+        for replica in self.replicas[1:]:
+            self.assertEqual(replica.sequencer.sequence_number(), 30)
+            self.assertEqual(replica.fortunes(), fortunes)
+
+    def test_only_primary_sequences(self):
+        with self.assertRaises(Exception):
+            self.replicas[1].sequencer.sequence("lost")
+
+    def test_updates_held_back(self):
+        backup = self.replicas[1].sequencer
+        # Update 2 waits for update 1.
+        thread = threading.Thread(target=backup.apply_update,
+                                  args=(2, "two"))
+        thread.start()
+        thread.join(0.2)
+        self.assertTrue(thread.is_alive())
+        self.assertEqual(backup.sequence_number(), 0)
+
+        backup.apply_update(1, "one")
+        thread.join()
+        self.assertEqual(backup.sequence_number(), 2)
+        self.assertEqual(self.replicas[1].fortunes()[-2:], ["one", "two"])
+
+    def test_missing_update(self):
+        with self.assertRaises(Exception):
+            self.replicas[2].sequencer.apply_update(5, "too early")
+
+
+if __name__ == "__main__":
+    unittest.main()
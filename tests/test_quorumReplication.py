@@ -0,0 +1,144 @@
+"""Tests of the quorum replication, on localhost replicas."""
+
+import os
+import sys
+import threading
+import unittest
+
+sys.path.append(os.path.dirname(__file__))
+from cluster import QuietTest, Cluster, FORTUNES, Replica, connect
+from Server.Replication.quorumReplication import QuorumReplication
+
+METHODS = ["replicate", "versions", "fetch_writes"]
+
+
+class QuorumReplicationTest(QuietTest):
+
+    def setUp(self):
+        QuietTest.setUp(self)
+        self.cluster = Cluster(3)
+        self.replicas = self.cluster.replicas
+
+    def tearDown(self):
+        self.cluster.close()
+        QuietTest.tearDown(self)
+
+    def start(self, write_quorum=None, read_quorum=None):
+        for replica in self.replicas:
+            replica.quorum = QuorumReplication(
+                replica, replica.peer_list, replica.db, replica.drwlock,
+                write_quorum, read_quorum, timeout=1.0)
+            replica.serve(replica.quorum, METHODS)
+            replica.start()
+        connect(self.replicas)
+
+    def test_quorums(self):
+        self.start()
+        self.assertEqual(self.replicas[0].quorum._quorums(), (3, 2, 2))
+
+    def test_write_to_all(self):
+        self.start(write_quorum=3)
+        errors = []
+
+        def writer(replica):
+            try:
+                for i in range(5):
+                    replica.quorum.write(
+                        "fortune {} of {}".format(i, replica.id))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=writer, args=(replica,))
+                   for replica in self.replicas]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        # The order of the origins may differ, the set may not.
+        expected = sorted(self.replicas[0].fortunes())
+        self.assertEqual(len(expected), len(FORTUNES) + 15)
+        for replica in self.replicas:
+            self.assertEqual(sorted(replica.fortunes()), expected)
+            self.assertEqual(dict(replica.quorum.versions()),
+                             {1: 5, 2: 5, 3: 5})
+
+    def test_read_repair(self):
+        self.start()
+        first, second, third = self.replicas
+        # The third replica misses the write.
+        connect([first, second], [first, second])
+        first.quorum.write("missed")
+        self.assertNotIn("missed", third.fortunes())
+
+        connect(self.replicas)
+        third.quorum.catch_up()
+        self.assertIn("missed", third.fortunes())
+        self.assertEqual(third.quorum.fetch_writes(1, 1), ["missed"])
+
+    def test_write_fails_without_quorum(self):
+        self.start()
+        first = self.replicas[0]
+        # Nobody listens at the addresses of the others.
+        down = [Replica(pid, self.cluster.directory.name)
+                for pid in (4, 5)]
+        connect([first], down)
+        with self.assertRaises(Exception):
+            first.quorum.write("alone")
+        # It is kept, for read-repair to pass on.
+        self.assertIn("alone", first.fortunes())
+        for replica in down:
+            replica.close()
+
+    def test_restart(self):
+        self.start(write_quorum=3)
+        first = self.replicas[0]
+        first.quorum.write("one")
+        first.quorum.write("two")
+        first.quorum.journal.close()
+
+        # The journal tells which writes the database holds.
+        first.quorum = QuorumReplication(
+            first, first.peer_list, first.db, first.drwlock, 3, None, 1.0)
+        first.serve(first.quorum, METHODS)
+        self.assertEqual(dict(first.quorum.versions()), {1: 2})
+        self.assertEqual(first.quorum.fetch_writes(1, 1), ["one", "two"])
+
+        # Numbering goes on where it was.
+        first.quorum.write("three")
+        for replica in self.replicas:
+            self.assertEqual(replica.quorum.fetch_writes(1, 1),
+                             ["one", "two", "three"])
+            self.assertEqual(replica.fortunes()[len(FORTUNES):],
+                             ["one", "two", "three"])
+
+    def test_stale_journal(self):
+        first = self.replicas[0]
+        with open(first.db_file + ".writes", "w") as f:
+            f.write("[5, 1000]\n")
+        self.start()
+        self.assertEqual(first.quorum.versions(), [])
+
+    def test_writes_held_back(self):
+        self.start()
+        quorum = self.replicas[0].quorum
+        thread = threading.Thread(target=quorum.replicate,
+                                  args=(7, 2, ["two", "three"]))
+        thread.start()
+        thread.join(0.2)
+        self.assertTrue(thread.is_alive())
+        self.assertEqual(quorum.fetch_writes(7, 1), [])
+
+        quorum.replicate(7, 1, ["one"])
+        thread.join()
+        self.assertEqual(quorum.fetch_writes(7, 1), ["one", "two", "three"])
+        self.assertEqual(self.replicas[0].fortunes()[-3:],
+                         ["one", "two", "three"])
+        # Writes already there are skipped.
+        quorum.replicate(7, 2, ["two"])
+        self.assertEqual(quorum.fetch_writes(7, 1), ["one", "two", "three"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+"""Tests of the local read/write lock."""
+
+import os
+import sys
+import time
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "modules"))
+from Common import lockStats
+from Server.Lock.readWriteLock import ReadWriteLock
+
+
+class ReadWriteLockTest(unittest.TestCase):
+
+    def setUp(self):
+        self.enabled = lockStats.enabled
+        lockStats.enable()
+
+    def tearDown(self):
+        lockStats.enabled = self.enabled
+
+    def test_write_timeout_keeps_hold_time(self):
+        lock = ReadWriteLock(name="test_write_timeout")
+        lock.write_acquire()
+        time.sleep(0.2)
+        self.assertFalse(lock.try_write_acquire(timeout=0.01))
+        lock.write_release()
+
+        stats = lockStats.snapshot()["test_write_timeout.write"]
+        self.assertEqual(stats["acquisitions"], 1)
+        self.assertEqual(stats["timeouts"], 1)
+        # Held from the first acquisition, not from the timeout.
+        self.assertGreaterEqual(stats["hold_total"], 0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+"""Tests of the segmented storage engine."""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "modules"))
+from Server.Storage.segmentedStore import SegmentedStore
+
+
+class SegmentedStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.directory, "fortune.db")
+        with open(self.db_file, "w") as f:
+            f.write("first\n%\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def open(self, compact_interval=3600, seal_interval=0.01):
+        # Segments sealed on age long before they are full, and no
+        # compaction behind our back.
+        return SegmentedStore(self.db_file, segment_size=2 ** 16,
+                              compact_interval=compact_interval,
+                              seal_interval=seal_interval)
+
+    def fill(self, store, count):
+        # Some fortunes occur several times.
+        for i in range(count):
+            store.append("fortune {}".format(i % 7))
+            store.flush()
+            time.sleep(0.02)
+
+    def fortunes(self, store):
+        return [store.get(i) for i in range(len(store))]
+
+    def test_seal_on_age(self):
+        store = self.open(seal_interval=3600)
+        try:
+            self.fill(store, 5)
+            self.assertEqual(len(store.names), 1)
+        finally:
+            store.close()
+
+        store = self.open()
+        try:
+            # The age of a segment counts from its first fortune, the
+            # next write seals it.
+            self.fill(store, 5)
+            self.assertEqual(len(store.names), 3)
+        finally:
+            store.close()
+
+    def test_compact_keeps_indexes(self):
+        store = self.open()
+        try:
+            self.fill(store, 20)
+            before = self.fortunes(store)
+            self.assertEqual(len(before), 21)
+            segments = len(store.names)
+            self.assertGreater(segments, 2)
+
+            removed = store.compact()
+
+            self.assertGreater(removed, 0)
+            self.assertEqual(removed, segments - len(store.names))
+            self.assertEqual(self.fortunes(store), before)
+            self.assertEqual(store.get(20), before[20])
+            # Nothing left to merge.
+            self.assertEqual(store.compact(), 0)
+
+            # New fortunes go after the old ones.
+            store.append("last")
+            store.flush()
+            self.assertEqual(self.fortunes(store), before + ["last\n"])
+            before = self.fortunes(store)
+        finally:
+            store.close()
+
+        store = self.open()
+        try:
+            self.assertEqual(self.fortunes(store), before)
+        finally:
+            store.close()
+
+    def test_background_compaction(self):
+        store = self.open(compact_interval=0.05)
+        try:
+            self.fill(store, 10)
+            before = self.fortunes(store)
+            deadline = time.time() + 5
+            while len(store.names) > 2 and time.time() < deadline:
+                time.sleep(0.05)
+            self.assertLessEqual(len(store.names), 2)
+            self.assertEqual(self.fortunes(store), before)
+        finally:
+            store.close()
+
+    def test_snapshot(self):
+        store = self.open()
+        try:
+            self.fill(store, 10)
+            self.assertGreater(store.compact(), 0)
+            before = self.fortunes(store)
+            copy = os.path.join(self.directory, "copy")
+            store.snapshot(copy + ".d")
+        finally:
+            store.close()
+
+        store = SegmentedStore(copy, compact_interval=3600)
+        try:
+            self.assertEqual(self.fortunes(store), before)
+        finally:
+            store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+"""Tests of the copy of a database to a joining replica."""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.dirname(__file__))
+from cluster import QuietTest
+from Server import database
+from Server.Replication import stateTransfer
+
+
+class StateTransferTest(QuietTest):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        QuietTest.setUp(self)
+
+    def tearDown(self):
+        QuietTest.tearDown(self)
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def transfer(self, engine):
+        donor_file = self.path("donor.db")
+        with open(donor_file, "w") as f:
+            f.write("first\n%\nsecond\nline\n%\n")
+        donor = database.Database(donor_file, engine)
+        joiner_file = self.path("joiner.db")
+        with open(joiner_file, "w") as f:
+            f.write("stale\n%\n")
+        # Leave the offset index or segments of the old file behind.
+        database.Database(joiner_file, engine).close()
+        try:
+            for i in range(5):
+                donor.write("fortune {}".format(i))
+
+            address, count = stateTransfer.serve(donor, "127.0.0.1")
+            # Writes made meanwhile are not part of the snapshot.
+            donor.write("after")
+            stateTransfer.receive(address, joiner_file)
+
+            joiner = database.Database(joiner_file, engine)
+            try:
+                self.assertEqual(count, 7)
+                self.assertEqual(len(joiner), count)
+                self.assertEqual(joiner.fortunes(0),
+                                 donor.fortunes(0, count))
+                # The joiner catches up by count, as serverPeer does.
+                for fortune in donor.fortunes(count):
+                    joiner.write(fortune)
+                self.assertEqual(joiner.fortunes(0), donor.fortunes(0))
+            finally:
+                joiner.close()
+        finally:
+            donor.close()
+
+    def test_list(self):
+        self.transfer("list")
+
+    def test_compact(self):
+        self.transfer("compact")
+
+    def test_mmap(self):
+        self.transfer("mmap")
+
+    def test_segmented(self):
+        self.transfer("segmented")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+"""Tests of the per-method call statistics."""
+
+import os
+import sys
+import threading
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "modules"))
+from Common import stats
+
+
+class MethodStatsTest(unittest.TestCase):
+
+    def call(self, method_stats, method, failed=False):
+        counters, start = method_stats.begin(method)
+        method_stats.end(counters, start, failed)
+
+    def test_snapshot(self):
+        method_stats = stats.MethodStats()
+        self.call(method_stats, "read")
+        self.call(method_stats, "read", True)
+        counters, start = method_stats.begin("write")
+
+        snapshot = method_stats.snapshot()
+        self.assertEqual(snapshot["read"]["calls"], 2)
+        self.assertEqual(snapshot["read"]["errors"], 1)
+        self.assertEqual(sum(snapshot["read"]["buckets"]), 2)
+        self.assertEqual(snapshot["write"]["inflight"], 1)
+
+    def test_thread_per_call(self):
+        method_stats = stats.MethodStats()
+        for i in range(100):
+            thread = threading.Thread(target=self.call,
+                                      args=(method_stats, "request_token"))
+            thread.start()
+            thread.join()
+
+        snapshot = method_stats.snapshot()
+        self.assertEqual(snapshot["request_token"]["calls"], 100)
+        # The counters of the threads that are over are not kept apart.
+        self.assertEqual(method_stats.shards, [])
+
+
+if __name__ == "__main__":
+    unittest.main()